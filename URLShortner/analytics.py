@@ -0,0 +1,190 @@
+# analytics.py
+"""Click analytics kept off the redirect hot path.
+
+A redirect only appends ``(code, referrer, time)`` to an in-memory deque.
+A background thread drains the deque every ``flush_interval`` seconds (or
+sooner once ``flush_size`` clicks are waiting), aggregates them per code
+and adds the counts to an SQLite table in one transaction.
+
+Rollups served by /stats/<code> are read from that table with one indexed
+query, so every worker reports the same totals (up to one flush interval
+behind). No worker replays click history at startup or keeps rollups in
+memory, however many clicks have been recorded.
+
+Clicks recorded by older versions in an append-only ``clicks.jsonl`` can be
+folded into a new database with ``import_log()``.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from urllib.parse import urlsplit
+
+# Recorders that need a new flusher thread in a forked child.
+_recorders = weakref.WeakSet()
+
+
+def _new_rollup():
+    return {"clicks": 0, "referrers": {}, "hourly": {}}
+
+
+class ClickRecorder:
+    """Buffers clicks in memory and flushes aggregated counts in the background."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS click_counts (
+            code TEXT NOT NULL,
+            kind TEXT NOT NULL,  -- 'total', 'referrer' or 'hour'
+            name TEXT NOT NULL,
+            clicks INTEGER NOT NULL,
+            PRIMARY KEY (code, kind, name)
+        ) WITHOUT ROWID;
+    """
+
+    UPSERT = ("INSERT INTO click_counts (code, kind, name, clicks) VALUES (?, ?, ?, ?) "
+              "ON CONFLICT (code, kind, name) DO UPDATE SET clicks = clicks + excluded.clicks")
+
+    def __init__(self, path="clicks.db", flush_interval=5.0, flush_size=10000,
+                 busy_timeout=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._closed = threading.Event()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(self.SCHEMA)
+
+        self._start_flusher()
+        _recorders.add(self)
+        atexit.register(self.close)
+
+    def _conn(self):
+        if self._pid != os.getpid():
+            # Connections must not cross a fork (e.g. gunicorn --preload).
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _start_flusher(self):
+        self._pending = deque()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _after_fork(self):
+        # Only the calling thread survives a fork. Clicks still buffered
+        # belong to the parent, which flushes them itself.
+        if not self._closed.is_set():
+            self._start_flusher()
+
+    def record(self, code, referrer=None):
+        """Note one click. O(1) and lock-free: this runs on every redirect."""
+        self._pending.append((code, referrer, time.time()))
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Aggregate pending clicks and add them to the stored rollups."""
+        with self._flush_lock:
+            counts = {}  # (code, kind, name) -> clicks
+            for _ in range(len(self._pending)):
+                code, referrer, timestamp = self._pending.popleft()
+                source = (urlsplit(referrer).hostname or referrer) if referrer else "(direct)"
+                hour = time.strftime("%Y-%m-%dT%H:00Z", time.gmtime(timestamp))
+                for key in ((code, "total", ""), (code, "referrer", source),
+                            (code, "hour", hour)):
+                    counts[key] = counts.get(key, 0) + 1
+            self._add_counts(counts)
+
+    def _add_counts(self, counts):
+        if not counts:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany(self.UPSERT, ((code, kind, name, n)
+                                           for (code, kind, name), n in counts.items()))
+
+    def import_log(self, path):
+        """Fold an older ``clicks.jsonl`` log into the table; returns its line count.
+
+        A torn last line is ignored.
+        """
+        counts = {}
+        lines = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                delta = json.loads(line)
+                code = delta["code"]
+                keys = [((code, "total", ""), delta["clicks"])]
+                keys += [((code, "referrer", name), n) for name, n in delta["referrers"].items()]
+                keys += [((code, "hour", name), n) for name, n in delta["hourly"].items()]
+                for key, n in keys:
+                    counts[key] = counts.get(key, 0) + n
+                lines += 1
+        self._add_counts(counts)
+        return lines
+
+    def stats(self, code):
+        """Return the rollup for ``code``, or None if it has no clicks."""
+        rows = self._conn().execute(
+            "SELECT kind, name, clicks FROM click_counts WHERE code = ?", (code,)).fetchall()
+        if not rows:
+            return None
+        rollup = _new_rollup()
+        for kind, name, clicks in rows:  # primary-key order: hours ascending
+            if kind == "total":
+                rollup["clicks"] = clicks
+            elif kind == "referrer":
+                rollup["referrers"][name] = clicks
+            else:
+                rollup["hourly"][name] = clicks
+        return rollup
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wakeup.set()
+        self._flusher.join()
+        self.flush()
+        _recorders.discard(self)
+        atexit.unregister(self.close)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._pid == os.getpid():
+            conn.close()
+            self._local.conn = None
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Warning: could not flush click analytics: {e}")
+
+
+def _restart_after_fork():
+    for recorder in list(_recorders):
+        recorder._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
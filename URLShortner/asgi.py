@@ -0,0 +1,92 @@
+# asgi.py
+"""ASGI entry point for production serving.
+
+    uvicorn asgi:app --workers 4
+
+The two hot routes are answered natively without going through Flask:
+the GET form (a pre-rendered page) and ``GET /<code>`` redirects, which
+only touch the in-process cache and, on a miss, one indexed store lookup.
+Cache hits are answered on the event loop; the store lookup runs in the
+loop's default executor so a slow disk never stalls other connections.
+Everything else (shortening, the batch API, stats) is passed to the Flask
+app through asgiref's WSGI adapter when it is installed.
+"""
+import asyncio
+
+from werkzeug.urls import iri_to_uri
+
+import url_shortener as shortener
+from cache import MISS
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # optional: only needed for the non-hot routes
+    WsgiToAsgi = None
+
+# Single-segment paths that are real routes rather than short codes.
+RESERVED = {"api", "stats"}
+
+_flask_app = WsgiToAsgi(shortener.app) if WsgiToAsgi is not None else None
+
+
+async def _send(send, status, headers, body=b""):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if shortener.clicks is not None:
+                shortener.clicks.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    if scope["method"] == "GET":
+        if path == "/":
+            headers = dict(scope["headers"])
+            if headers.get(b"if-none-match", b"").strip(b'"') == shortener.FORM_ETAG.encode():
+                await _send(send, 304, [(b"etag", b'"' + shortener.FORM_ETAG.encode() + b'"')])
+                return
+            await _send(send, 200, [
+                (b"content-type", b"text/html; charset=utf-8"),
+                (b"content-length", str(len(shortener.FORM_PAGE)).encode()),
+                (b"etag", b'"' + shortener.FORM_ETAG.encode() + b'"'),
+                (b"cache-control", b"public, max-age=3600"),
+            ], shortener.FORM_PAGE)
+            return
+
+        code = path[1:]
+        if code and "/" not in code and code not in RESERVED:
+            long_url = shortener.redirect_cache.get(code)
+            if long_url is MISS:
+                loop = asyncio.get_running_loop()
+                long_url = await loop.run_in_executor(None, shortener.lookup_store, code)
+            if long_url:
+                if shortener.clicks is not None:
+                    referrer = dict(scope["headers"]).get(b"referer")
+                    shortener.clicks.record(code, referrer.decode("latin-1") if referrer else None)
+                await _send(send, 302, [(b"location", iri_to_uri(long_url).encode("latin-1")),
+                                        (b"content-length", b"0")])
+            else:
+                await _send(send, 404, [(b"content-type", b"text/plain; charset=utf-8")],
+                            b"URL not found")
+            return
+
+    if _flask_app is None:
+        await _send(send, 501, [(b"content-type", b"text/plain; charset=utf-8")],
+                    b"Install asgiref to serve this route over ASGI")
+        return
+    await _flask_app(scope, receive, send)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Load-test and latency benchmark for the URL shortener.
+
+For each storage/cache configuration the benchmark seeds N mappings, then
+replays a workload of redirects (codes drawn from a Zipf distribution, so a
+few codes get most of the traffic) mixed with shorten requests at a given
+rate. It reports throughput and p50/p99/p99.9 latency per request type and
+writes everything to a JSON file so runs can be compared across releases.
+
+Examples:
+    # In-process (Flask test client), two configurations
+    python benchmark.py --mappings 1000000 --requests 200000 \\
+        --config sqlite:cache=100000 --config sqlite:cache=0
+
+    # Against a running instance (seeded through /api/batch)
+    python benchmark.py --target http://127.0.0.1:8000 --threads 8
+
+Configurations look like ``backend[:option=value...]``. The backend is
+``sqlite`` or ``log``, and the options are ``cache`` (redirect cache size)
+and ``negative_ttl``. The same ``--seed`` always gives the same workload.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CONFIGS = ["sqlite:cache=100000", "sqlite:cache=0", "log:cache=100000"]
+SEED_BATCH = 50000
+
+
+def parse_config(spec):
+    """Parse ``backend[:key=value...]`` into a dict of configure() options."""
+    backend, *options = spec.split(":")
+    config = {"backend": backend, "cache_size": 100000, "negative_ttl": 30.0}
+    for option in options:
+        key, _, value = option.partition("=")
+        if key == "cache":
+            config["cache_size"] = int(value)
+        elif key == "negative_ttl":
+            config["negative_ttl"] = float(value)
+        else:
+            raise ValueError(f"Unknown option '{key}' in config '{spec}'")
+    return config
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """Latency summary in milliseconds plus requests/second."""
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+        "p999_ms": _ms(percentile(latencies, 0.999)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 4)
+
+
+def build_workload(codes, requests, zipf_s, shorten_rate, seed):
+    """Return a reproducible list of ("redirect", code) / ("shorten", url) ops."""
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1.0 / rank ** zipf_s
+                                            for rank in range(1, len(codes) + 1)))
+    targets = rng.choices(codes, cum_weights=cum_weights, k=requests)
+    ops = []
+    for i, code in enumerate(targets):
+        if rng.random() < shorten_rate:
+            ops.append(("shorten", f"https://bench.example.com/new/{seed}/{i}"))
+        else:
+            ops.append(("redirect", code))
+    return ops
+
+
+# -- clients -------------------------------------------------------------------
+
+
+class InProcessClient:
+    """Drives the Flask app directly through its test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def redirect(self, code):
+        return self.client.get("/" + code).status_code
+
+    def shorten(self, long_url):
+        return self.client.post("/", data={"long_url": long_url}).status_code
+
+
+class HttpClient:
+    """Keep-alive HTTP client for a running instance."""
+
+    def __init__(self, target):
+        parts = urlsplit(target)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    def _request(self, method, path, body=None, headers=None):
+        self.connection.request(method, path, body=body, headers=headers or {})
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def redirect(self, code):
+        return self._request("GET", "/" + code)
+
+    def shorten(self, long_url):
+        return self._request("POST", "/", urlencode({"long_url": long_url}),
+                             {"Content-Type": "application/x-www-form-urlencoded"})
+
+
+def seed_remote(target, count):
+    """Create ``count`` mappings on a running instance; returns their codes."""
+    parts = urlsplit(target)
+    codes = []
+    for start in range(0, count, SEED_BATCH):
+        body = "\n".join(f"https://bench.example.com/seed/{i}"
+                         for i in range(start, min(count, start + SEED_BATCH)))
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=600)
+        connection.request("POST", "/api/batch", body=body, headers={"Content-Type": "text/plain"})
+        response = connection.getresponse()
+        for line in response.read().splitlines():
+            codes.append(json.loads(line)["code"])
+        connection.close()
+    return codes
+
+
+def seed_local(shortener, count):
+    codes = []
+    for start in range(0, count, SEED_BATCH):
+        size = min(SEED_BATCH, count - start)
+        batch = shortener.code_allocator.next_codes(size)
+        shortener.store.put_many(zip(batch, (f"https://bench.example.com/seed/{i}"
+                                             for i in range(start, start + size))))
+        codes.extend(batch)
+    return codes
+
+
+# -- runner --------------------------------------------------------------------
+
+
+def replay(make_client, ops, threads):
+    """Run ``ops`` split across ``threads`` closed-loop workers."""
+    latencies = {"redirect": [], "shorten": []}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = make_client()
+        local = {"redirect": [], "shorten": []}
+        failed = 0
+        for kind, arg in chunk:
+            began = time.perf_counter()
+            status = client.redirect(arg) if kind == "redirect" else client.shorten(arg)
+            local[kind].append(time.perf_counter() - began)
+            if status >= 400:
+                failed += 1
+        with lock:
+            for kind in local:
+                latencies[kind].extend(local[kind])
+            errors.append(failed)
+
+    workers = [threading.Thread(target=worker, args=(ops[i::threads],)) for i in range(threads)]
+    began = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    result = {kind: summarize(values, elapsed) for kind, values in latencies.items()}
+    result["overall"] = summarize(latencies["redirect"] + latencies["shorten"], elapsed)
+    result["errors"] = sum(errors)
+    result["elapsed_s"] = round(elapsed, 3)
+    return result
+
+
+def run_local(config, args):
+    temp_dir = tempfile.mkdtemp(prefix="shortener-bench-")
+    if "url_shortener" not in sys.modules:
+        # The app opens its default store and click database on import;
+        # keep them out of the cwd.
+        os.environ["URL_DB"] = os.path.join(temp_dir, "import.db")
+        os.environ["URL_CLICKS_DB"] = os.path.join(temp_dir, "import-clicks.db")
+        os.environ["URL_CLICKS_FILE"] = os.path.join(temp_dir, "import-clicks.jsonl")
+    import url_shortener as shortener
+
+    try:
+        shortener.configure(backend=config["backend"],
+                            db_file=os.path.join(temp_dir, "urls.db"),
+                            data_file=os.path.join(temp_dir, "urls.json"),
+                            cache_size=config["cache_size"],
+                            negative_ttl=config["negative_ttl"],
+                            analytics=args.analytics,
+                            clicks_db=os.path.join(temp_dir, "clicks.db"))
+        began = time.perf_counter()
+        codes = seed_local(shortener, args.mappings)
+        seed_seconds = time.perf_counter() - began
+
+        ops = build_workload(codes, args.requests, args.zipf, args.shorten_rate, args.seed)
+        result = replay(lambda: InProcessClient(shortener.app), ops, args.threads)
+        result["cache"] = shortener.redirect_cache.stats()
+        result["seed_s"] = round(seed_seconds, 3)
+        return result
+    finally:
+        shortener.sweeper.close()
+        if shortener.clicks is not None:
+            shortener.clicks.close()
+        shortener.store.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run_remote(args):
+    began = time.perf_counter()
+    codes = seed_remote(args.target, args.mappings)
+    seed_seconds = time.perf_counter() - began
+    ops = build_workload(codes, args.requests, args.zipf, args.shorten_rate, args.seed)
+    result = replay(lambda: HttpClient(args.target), ops, args.threads)
+    result["seed_s"] = round(seed_seconds, 3)
+    return result
+
+
+def run(args):
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mappings": args.mappings,
+            "requests": args.requests,
+            "zipf": args.zipf,
+            "shorten_rate": args.shorten_rate,
+            "threads": args.threads,
+            "seed": args.seed,
+            "analytics": args.analytics,
+            "target": args.target or "in-process",
+        },
+        "results": [],
+    }
+    if args.target:
+        runs = [("remote", lambda: run_remote(args))]
+    else:
+        configs = args.config or DEFAULT_CONFIGS
+        runs = [(spec, lambda spec=spec: run_local(parse_config(spec), args)) for spec in configs]
+
+    for name, runner in runs:
+        print(f"▶ {name}: seeding {args.mappings:,} mappings, replaying {args.requests:,} requests...")
+        result = runner()
+        result["config"] = name
+        report["results"].append(result)
+        redirect = result["redirect"]
+        print(f"  {result['overall']['throughput_rps']:>10,.0f} req/s | redirect p50 "
+              f"{redirect['p50_ms']} ms, p99 {redirect['p99_ms']} ms, p99.9 {redirect['p999_ms']} ms"
+              f" | errors {result['errors']}")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="URL shortener load test and latency benchmark")
+    parser.add_argument("--mappings", type=int, default=100000, help="mappings to seed")
+    parser.add_argument("--requests", type=int, default=100000, help="requests to replay")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of redirect traffic")
+    parser.add_argument("--shorten-rate", type=float, default=0.01,
+                        help="fraction of requests that shorten a new URL")
+    parser.add_argument("--threads", type=int, default=1, help="concurrent client threads")
+    parser.add_argument("--config", action="append",
+                        help="storage/cache configuration, repeatable (default: %s)"
+                             % ", ".join(DEFAULT_CONFIGS))
+    parser.add_argument("--target", help="benchmark a running instance at this base URL instead")
+    parser.add_argument("--analytics", action="store_true", help="record click analytics")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the workload")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    return parser
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
@@ -0,0 +1,96 @@
+# cache.py
+"""In-process LRU cache in front of the store for redirect lookups.
+
+Unknown codes are cached too (negative caching) for a short TTL, so
+scanners probing random codes do not cost a store lookup each time. The
+negative entries live in their own, separately bounded LRU so a scan can
+never push hot links out of the positive cache.
+
+Entries for expiring links remember their expiry time, so the cache never
+serves a link after it has expired.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by RedirectCache.get() when the cache knows nothing about a code.
+MISS = object()
+
+
+class RedirectCache:
+    """Bounded LRU of ``code -> (long_url, expires_at)`` plus a TTL'd set of unknown codes."""
+
+    def __init__(self, capacity=100000, negative_ttl=30.0, negative_capacity=100000,
+                 clock=time.monotonic):
+        self.capacity = capacity
+        self.negative_ttl = negative_ttl
+        self.negative_capacity = negative_capacity
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._negative = OrderedDict()  # code -> expiry time
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, code):
+        """Return the cached long URL, None for a cached 404, or MISS."""
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is not None:
+                long_url, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(code)
+                    self.hits += 1
+                    return long_url
+                del self._entries[code]
+            expires = self._negative.get(code)
+            if expires is not None:
+                if expires > self.clock():
+                    self.negative_hits += 1
+                    return None
+                del self._negative[code]
+            self.misses += 1
+            return MISS
+
+    def set(self, code, long_url, expires_at=None):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._negative.pop(code, None)
+            self._entries[code] = (long_url, expires_at)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_missing(self, code):
+        """Remember that ``code`` does not exist, for ``negative_ttl`` seconds."""
+        if self.negative_ttl <= 0 or self.negative_capacity <= 0:
+            return
+        with self._lock:
+            self._negative[code] = self.clock() + self.negative_ttl
+            self._negative.move_to_end(code)
+            while len(self._negative) > self.negative_capacity:
+                self._negative.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, code):
+        with self._lock:
+            self._entries.pop(code, None)
+            self._negative.pop(code, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "negative_size": len(self._negative),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
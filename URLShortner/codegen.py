@@ -0,0 +1,93 @@
+# codegen.py
+"""Collision-free short-code allocation.
+
+Every code is a unique integer ID written in base62. Workers lease blocks
+of IDs from the store (one store round-trip per ``block_size`` codes) and
+hand them out from memory, so allocating a code is O(1) and two workers
+can never produce the same code.
+
+IDs are optionally passed through an affine permutation of the keyspace
+before encoding so consecutive links do not get consecutive-looking codes.
+The permutation is a bijection, so it cannot introduce collisions; it only
+hides ordering and is not meant to be cryptographically unguessable.
+
+Codes are always CODE_LENGTH (7) characters, so they can never clash with
+the 6-character random codes created by older versions.
+"""
+import string
+import threading
+
+ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+BASE = len(ALPHABET)
+CODE_LENGTH = 7
+KEYSPACE = BASE ** CODE_LENGTH
+
+# MULTIPLIER must be coprime with KEYSPACE (i.e. with 2 and 31) for the
+# permutation to be a bijection.
+MULTIPLIER = 2_654_435_761
+OFFSET = 1_234_567_891
+
+
+def encode_base62(number, width=CODE_LENGTH):
+    """Encode a non-negative integer as a fixed-width base62 string."""
+    if not 0 <= number < BASE ** width:
+        raise ValueError(f"{number} does not fit in {width} base62 digits")
+    digits = []
+    for _ in range(width):
+        number, remainder = divmod(number, BASE)
+        digits.append(ALPHABET[remainder])
+    return "".join(reversed(digits))
+
+
+def decode_base62(code):
+    number = 0
+    for char in code:
+        number = number * BASE + ALPHABET.index(char)
+    return number
+
+
+def permute(number):
+    """Map an ID onto a scrambled position in the keyspace (bijective)."""
+    return (number * MULTIPLIER + OFFSET) % KEYSPACE
+
+
+class CodeAllocator:
+    """Hands out codes from ID ranges leased from the store."""
+
+    def __init__(self, store, block_size=1000, scramble=True):
+        self.store = store
+        self.block_size = block_size
+        self.scramble = scramble
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self.store.lease_block(self.block_size)
+            if self._next >= KEYSPACE:
+                raise RuntimeError("Short-code keyspace exhausted")
+            number = self._next
+            self._next += 1
+            return number
+
+    def next_code(self):
+        number = self.next_id()
+        return encode_base62(permute(number) if self.scramble else number)
+
+    def next_codes(self, count):
+        """Allocate ``count`` codes at once, with at most one lease."""
+        with self._lock:
+            available = self._end - self._next
+            if available < count:
+                # Drop the rest of the current block rather than stitching
+                # two leases together; IDs are plentiful.
+                self._next, self._end = self.store.lease_block(max(self.block_size, count))
+            if self._next + count > KEYSPACE:
+                raise RuntimeError("Short-code keyspace exhausted")
+            start = self._next
+            self._next += count
+        if self.scramble:
+            return [encode_base62(permute(n)) for n in range(start, start + count)]
+        return [encode_base62(n) for n in range(start, start + count)]
@@ -0,0 +1,88 @@
+# expiry.py
+"""Background reclamation of expired short links.
+
+Lookups already hide expired links; the sweeper only frees their storage.
+Each pass asks the store for links whose expiry has passed, in expiry
+order and in batches, and drops them from the redirect cache.
+
+The same thread also indexes, in batches, mappings stored before the
+dedup index existed, so old links are reused without a startup scan.
+"""
+import os
+import threading
+import weakref
+
+# Sweepers that need a new thread in a forked child.
+_sweepers = weakref.WeakSet()
+
+
+class ExpirySweeper:
+    """Periodically calls ``store.purge_expired()`` from a daemon thread."""
+
+    def __init__(self, store, cache=None, interval=60.0, batch_size=1000):
+        self.store = store
+        self.cache = cache
+        self.interval = interval
+        self.batch_size = batch_size
+        self.purged = 0
+        self.backfilled = 0
+        self._backfill_done = False
+        self._closed = threading.Event()
+        self._start()
+        _sweepers.add(self)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        # Only the calling thread survives a fork (e.g. gunicorn --preload).
+        if not self._closed.is_set():
+            self._start()
+
+    def sweep(self, now=None):
+        """Purge everything that has expired by ``now``; returns the count."""
+        total = 0
+        while True:
+            codes = self.store.purge_expired(now, self.batch_size)
+            if self.cache is not None:
+                for code in codes:
+                    self.cache.invalidate(code)
+            total += len(codes)
+            if len(codes) < self.batch_size:
+                break
+        self.purged += total
+        return total
+
+    def backfill(self):
+        """Index mappings that predate the dedup index; returns the count."""
+        total = 0
+        while not self._backfill_done and not self._closed.is_set():
+            count = self.store.backfill_url_hashes(self.batch_size)
+            total += count
+            if count < self.batch_size:
+                self._backfill_done = True  # new mappings are always indexed
+        self.backfilled += total
+        return total
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        _sweepers.discard(self)
+
+    def _loop(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.sweep()
+                self.backfill()
+            except Exception as e:
+                print(f"Warning: expiry sweep failed: {e}")
+
+
+def _restart_after_fork():
+    for sweeper in list(_sweepers):
+        sweeper._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
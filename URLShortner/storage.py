@@ -0,0 +1,547 @@
+# storage.py
+"""Persistent storage for short-code -> long-URL mappings.
+
+Two backends implement the same small interface (BaseStore):
+
+SQLiteStore keeps the mapping in an SQLite database in WAL mode, so every
+worker process shares one table and a redirect is a single primary-key
+lookup. It is the default.
+
+LogStore keeps the whole mapping in memory, appends every new mapping to
+an append-only log (one JSON object per line, fsynced before the write is
+acknowledged) and periodically folds the log into a JSON snapshot in a
+background thread. Startup replays snapshot + log.
+
+Links may carry an expiry time (Unix seconds). Expired links are hidden
+lazily by every lookup and reclaimed by purge_expired(), which walks an
+expiry-ordered index (an SQLite partial index, or a heap in LogStore), so
+its cost depends on how many links expire, not on the table size.
+"""
+import hashlib
+import json
+import os
+import heapq
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(long_url):
+    """Canonical form used to spot repeat submissions of the same target.
+
+    Lower-cases the scheme and host, drops a default port and turns an empty
+    path into "/". Path, query and fragment are kept as-is since servers may
+    treat them case- and order-sensitively.
+    """
+    parts = urlsplit(long_url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    if parts.hostname:
+        netloc = parts.hostname
+        if ":" in netloc:
+            netloc = f"[{netloc}]"
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port is not None and port != DEFAULT_PORTS.get(scheme):
+            netloc += f":{port}"
+        userinfo = parts.netloc.rpartition("@")[0]
+        if userinfo:
+            netloc = f"{userinfo}@{netloc}"
+    path = parts.path or ("/" if netloc else "")
+    return urlunsplit((scheme, netloc, path, parts.query, parts.fragment))
+
+
+def url_hash(long_url):
+    """16-byte digest of the normalised URL, the key of the dedup index."""
+    return hashlib.sha1(normalize_url(long_url).encode("utf-8")).digest()[:16]
+
+
+class BaseStore:
+    """Interface shared by the storage backends."""
+
+    def get_entry(self, code):
+        """Return ``(long_url, expires_at)`` for a live code, or None."""
+        raise NotImplementedError
+
+    def get(self, code):
+        """Return the long URL for a live ``code``, or None."""
+        entry = self.get_entry(code)
+        return entry[0] if entry else None
+
+    def put(self, code, long_url, expires_at=None):
+        """Durably store a mapping, optionally expiring at ``expires_at``."""
+        raise NotImplementedError
+
+    def put_many(self, pairs, expires_at=None):
+        """Durably store an iterable of ``(code, long_url)`` pairs at once."""
+        raise NotImplementedError
+
+    def items(self):
+        """Iterate over all ``(code, long_url)`` pairs."""
+        raise NotImplementedError
+
+    def lease_block(self, size):
+        """Reserve ``size`` fresh code IDs; returns ``(start, end)``."""
+        raise NotImplementedError
+
+    def find_code(self, long_url):
+        """Return an existing non-expiring code for the same (normalised) URL."""
+        raise NotImplementedError
+
+    def purge_expired(self, now=None, limit=1000):
+        """Delete up to ``limit`` expired links; returns their codes."""
+        raise NotImplementedError
+
+    def backfill_url_hashes(self, limit=1000):
+        """Index up to ``limit`` mappings that predate the dedup index.
+
+        Returns how many were indexed; 0 once every mapping is indexed.
+        """
+        return 0
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+    def close(self):
+        pass
+
+
+class SQLiteStore(BaseStore):
+    """SQLite backend in WAL mode, safe to share between processes.
+
+    Each thread (and each forked worker) gets its own connection; sqlite3
+    keeps a per-connection cache of prepared statements, so the hot queries
+    are parsed once per connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS urls (
+            code TEXT PRIMARY KEY,
+            long_url TEXT NOT NULL,
+            url_hash BLOB,
+            expires_at REAL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        INSERT OR IGNORE INTO counters (name, value) VALUES ('next_id', 0);
+    """
+
+    # Columns added after the first release, created in place on older
+    # databases. Existing rows get NULL, so no startup backfill scan;
+    # backfill_url_hashes() indexes them later in small batches.
+    ADDED_COLUMNS = {"url_hash": "BLOB", "expires_at": "REAL"}
+
+    def __init__(self, path, cache_size_kib=16384, synchronous="FULL",
+                 busy_timeout=5.0, cached_statements=128):
+        self.path = path
+        self.cache_size_kib = cache_size_kib
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._pid = os.getpid()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(self.SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(urls)")]
+            for column, sql_type in self.ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE urls ADD COLUMN {column} {sql_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS urls_by_hash ON urls (url_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS urls_by_expiry ON urls (expires_at) "
+                         "WHERE expires_at IS NOT NULL")
+
+    def _conn(self):
+        if self._pid != os.getpid():
+            # Connections must not cross a fork (e.g. gunicorn --preload).
+            self._local = threading.local()
+            self._connections = []
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   cached_statements=self.cached_statements,
+                                   check_same_thread=False)
+            conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get_entry(self, code):
+        row = self._conn().execute(
+            "SELECT long_url, expires_at FROM urls WHERE code = ?", (code,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row
+
+    def put(self, code, long_url, expires_at=None):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO urls (code, long_url, url_hash, expires_at) "
+                         "VALUES (?, ?, ?, ?)",
+                         (code, long_url, url_hash(long_url), expires_at))
+
+    def put_many(self, pairs, expires_at=None):
+        """Store many mappings in a single transaction."""
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO urls (code, long_url, url_hash, expires_at) "
+                             "VALUES (?, ?, ?, ?)",
+                             ((code, long_url, url_hash(long_url), expires_at)
+                              for code, long_url in pairs))
+
+    def find_code(self, long_url):
+        row = self._conn().execute(
+            "SELECT code FROM urls WHERE url_hash = ? AND expires_at IS NULL LIMIT 1",
+            (url_hash(long_url),)).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self, now=None, limit=1000):
+        now = time.time() if now is None else now
+        conn = self._conn()
+        with conn:
+            codes = [row[0] for row in conn.execute(
+                "SELECT code FROM urls WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+                (now, limit))]
+            conn.executemany("DELETE FROM urls WHERE code = ?", ((code,) for code in codes))
+        return codes
+
+    def backfill_url_hashes(self, limit=1000):
+        conn = self._conn()
+        with conn:
+            rows = conn.execute("SELECT code, long_url FROM urls WHERE url_hash IS NULL LIMIT ?",
+                                (limit,)).fetchall()
+            conn.executemany("UPDATE urls SET url_hash = ? WHERE code = ?",
+                             ((url_hash(long_url), code) for code, long_url in rows))
+        return len(rows)
+
+    def items(self):
+        return iter(self._conn().execute(
+            "SELECT code, long_url FROM urls WHERE expires_at IS NULL OR expires_at > ?",
+            (time.time(),)))
+
+    def lease_block(self, size):
+        conn = self._conn()
+        with conn:
+            # The UPDATE takes the write lock, so concurrent leases from
+            # other workers serialise and never overlap.
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'next_id'",
+                         (size,))
+            end = conn.execute(
+                "SELECT value FROM counters WHERE name = 'next_id'").fetchone()[0]
+        return end - size, end
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class LogStore(BaseStore):
+    """Snapshot + append-only log storage (single process only).
+
+    Files used (``path`` is the snapshot, e.g. ``urls.json``):
+      - ``urls.json``            snapshot, ``{code: long_url}``, or
+                                 ``{code: [long_url, expires_at]}`` for
+                                 expiring links
+      - ``urls.json.log``        active append-only log
+      - ``urls.json.log.old``    log being folded by an in-flight compaction
+
+    Log records are ``{"c": code, "u": long_url}`` for mappings (plus
+    ``"e": expires_at`` for expiring ones) and ``{"n": next_id}`` for code-ID
+    leases.
+    """
+
+    def __init__(self, path, compact_every=10000, compact_interval=60.0, fsync=True,
+                 write_slice=10000):
+        self.path = path
+        self.write_slice = write_slice  # records per write in put_many()
+        self.log_path = path + ".log"
+        self.old_log_path = self.log_path + ".old"
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.fsync = fsync
+        self.mapping = {}
+        self.by_hash = {}  # url_hash -> code, the dedup index
+        self.expiry = {}  # code -> expires_at, only for expiring links
+        self._expiry_heap = []  # (expires_at, code), the expiry-ordered index
+        self.next_id = 0
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._log_entries = 0
+        self._closed = threading.Event()
+        self._wakeup = threading.Event()
+
+        self._load()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+        self._compactor.start()
+
+    # -- loading -----------------------------------------------------------
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                now = time.time()
+                for code, value in json.load(f).items():
+                    if isinstance(value, list):
+                        if value[1] > now:
+                            self._add(code, value[0], value[1])
+                    else:
+                        self._add(code, value)
+        # A leftover ".old" log means a compaction did not finish; its
+        # records are not guaranteed to be in the snapshot, so replay it.
+        for log_path in (self.old_log_path, self.log_path):
+            self._log_entries += self._replay(log_path)
+
+    def _replay(self, log_path):
+        if not os.path.exists(log_path):
+            return 0
+        count = 0
+        good_end = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                count += 1
+                good_end += len(line)
+        if good_end < os.path.getsize(log_path):
+            # Torn tail from a crash mid-write. It was never acknowledged,
+            # so drop it; otherwise the next append would be glued onto it.
+            with open(log_path, "r+b") as f:
+                f.truncate(good_end)
+        return count
+
+    def _apply(self, record):
+        if "n" in record:
+            self.next_id = max(self.next_id, record["n"])
+        elif record.get("e") is None:
+            self._add(record["c"], record["u"])
+        elif record["e"] > time.time():
+            self._add(record["c"], record["u"], record["e"])
+
+    def _add(self, code, long_url, expires_at=None):
+        # The dedup index is filled in the same pass that loads each
+        # mapping, so it never needs a separate rebuild.
+        self.mapping[code] = long_url
+        if expires_at is None:
+            self.expiry.pop(code, None)
+            self.by_hash.setdefault(url_hash(long_url), code)
+        else:
+            self.expiry[code] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, code))
+
+    def _record(self, code, long_url, expires_at):
+        record = {"c": code, "u": long_url}
+        if expires_at is not None:
+            record["e"] = expires_at
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+    def _append(self, lines):
+        # Caller holds self._lock.
+        self._log.write(lines)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    # -- public API --------------------------------------------------------
+
+    def get_entry(self, code):
+        long_url = self.mapping.get(code)
+        if long_url is None:
+            return None
+        expires_at = self.expiry.get(code)
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return long_url, expires_at
+
+    def put(self, code, long_url, expires_at=None):
+        """Store a mapping; returns once the log record is durable."""
+        line = self._record(code, long_url, expires_at)
+        with self._lock:
+            self._append(line)
+            self._add(code, long_url, expires_at)
+            self._log_entries += 1
+            if self._log_entries >= self.compact_every:
+                self._wakeup.set()
+
+    def put_many(self, pairs, expires_at=None):
+        """Store many mappings with a single fsync.
+
+        ``pairs`` is consumed and written ``write_slice`` records at a time,
+        so memory does not grow with the batch. Mappings become readable
+        slice by slice, before the closing fsync; callers only hand out the
+        new codes after put_many() returns.
+        """
+        added = 0
+        with self._lock:
+            chunk = []
+            for code, long_url in pairs:
+                chunk.append((code, long_url))
+                if len(chunk) == self.write_slice:
+                    added += self._write_slice(chunk, expires_at)
+                    chunk = []
+            added += self._write_slice(chunk, expires_at)
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._log_entries += added
+            if self._log_entries >= self.compact_every:
+                self._wakeup.set()
+
+    def _write_slice(self, pairs, expires_at):
+        # Caller holds self._lock and fsyncs once the whole batch is written.
+        self._log.write("".join(self._record(code, long_url, expires_at)
+                                for code, long_url in pairs))
+        for code, long_url in pairs:
+            self._add(code, long_url, expires_at)
+        return len(pairs)
+
+    def items(self):
+        now = time.time()
+        return iter([(code, long_url) for code, long_url in self.mapping.items()
+                     if self.expiry.get(code, now + 1) > now])
+
+    def find_code(self, long_url):
+        return self.by_hash.get(url_hash(long_url))
+
+    def purge_expired(self, now=None, limit=1000):
+        now = time.time() if now is None else now
+        purged = []
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now and len(purged) < limit:
+                expires_at, code = heapq.heappop(heap)
+                # Skip heap entries made stale by a later put of the same code.
+                if self.expiry.get(code) == expires_at:
+                    del self.expiry[code]
+                    del self.mapping[code]
+                    purged.append(code)
+        # No log record is needed: replay already drops expired entries,
+        # and the next compaction leaves them out of the snapshot.
+        return purged
+
+    def lease_block(self, size):
+        with self._lock:
+            start = self.next_id
+            self._append(json.dumps({"n": start + size}) + "\n")
+            self.next_id = start + size
+        return start, start + size
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def compact(self):
+        """Fold the log into the snapshot.
+
+        Only the log rotation and the dict copy happen under the write lock;
+        serialising the snapshot runs concurrently with new puts, which keep
+        going to the fresh log.
+        """
+        with self._compact_lock:
+            with self._lock:
+                if self._log_entries == 0 and not os.path.exists(self.old_log_path):
+                    return
+                self._log.close()
+                if os.path.exists(self.old_log_path):
+                    # Previous compaction never finished: keep its records
+                    # by appending the current log to it.
+                    with open(self.log_path, "r", encoding="utf-8") as src, \
+                            open(self.old_log_path, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                    os.remove(self.log_path)
+                else:
+                    os.replace(self.log_path, self.old_log_path)
+                self._log = open(self.log_path, "a", encoding="utf-8")
+                # The snapshot only holds mappings, so carry the ID
+                # high-water mark over into the fresh log.
+                if self.next_id:
+                    self._append(json.dumps({"n": self.next_id}) + "\n")
+                self._log_entries = 0
+                snapshot = dict(self.mapping)
+                for code, expires_at in self.expiry.items():
+                    snapshot[code] = [snapshot[code], expires_at]
+
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            os.remove(self.old_log_path)
+
+    def close(self):
+        self._closed.set()
+        self._wakeup.set()
+        self._compactor.join()
+        self.compact()
+        with self._lock:
+            self._log.close()
+
+    # -- background compaction --------------------------------------------
+
+    def _compact_loop(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            if self._closed.is_set():
+                break
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"Warning: log compaction failed: {e}")
+
+
+def open_store(backend, path, **options):
+    """Create a store by backend name ("sqlite" or "log")."""
+    if backend == "sqlite":
+        return SQLiteStore(path, **options)
+    if backend == "log":
+        return LogStore(path, **options)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def import_json(store, path, batch_size=10000):
+    """Load a ``{code: long_url}`` JSON file into ``store``; returns the count."""
+    with open(path, "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+    pairs = list(mapping.items())
+    for start in range(0, len(pairs), batch_size):
+        store.put_many(pairs[start:start + batch_size])
+    return len(pairs)
+
+
+def export_json(store, path):
+    """Write every mapping in ``store`` to a ``{code: long_url}`` JSON file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i, (code, long_url) in enumerate(store.items()):
+            if i:
+                f.write(", ")
+            f.write(json.dumps(code) + ": " + json.dumps(long_url))
+        f.write("}")
+    os.replace(tmp_path, path)
@@ -0,0 +1,758 @@
+#!/usr/bin/env python3
+"""
+Tests for the URL shortener storage and web app.
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Keep the app's import-time store out of the working directory.
+_import_dir = tempfile.mkdtemp()
+os.environ["URL_DB"] = os.path.join(_import_dir, "urls.db")
+os.environ["URL_CLICKS_DB"] = os.path.join(_import_dir, "clicks.db")
+os.environ["URL_CLICKS_FILE"] = os.path.join(_import_dir, "clicks.jsonl")
+
+from analytics import ClickRecorder
+from cache import MISS, RedirectCache
+from expiry import ExpirySweeper
+from codegen import CODE_LENGTH, KEYSPACE, CodeAllocator, decode_base62, encode_base62, permute
+from storage import LogStore, SQLiteStore, import_json, export_json, normalize_url
+import url_shortener
+import asgi
+import benchmark
+
+
+class TestLogStore(unittest.TestCase):
+    """Snapshot + append-only log storage."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "urls.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def open_store(self, **kwargs):
+        kwargs.setdefault("compact_interval", 3600)
+        return LogStore(self.path, **kwargs)
+
+    def test_put_appends_to_log_without_rewriting_snapshot(self):
+        store = self.open_store()
+        store.put("abc123", "https://example.com")
+        self.assertFalse(os.path.exists(self.path))
+        with open(store.log_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        store.close()
+
+    def test_replay_snapshot_and_log(self):
+        with open(self.path, "w") as f:
+            json.dump({"old": "https://old.example.com"}, f)
+        store = self.open_store()
+        store.put("new", "https://new.example.com")
+        # Simulate a crash: no close(), no compaction.
+        reopened = self.open_store()
+        self.assertEqual(reopened.get("old"), "https://old.example.com")
+        self.assertEqual(reopened.get("new"), "https://new.example.com")
+        reopened.close()
+
+    def test_compact_folds_log_into_snapshot(self):
+        store = self.open_store()
+        for i in range(10):
+            store.put(f"code{i}", f"https://example.com/{i}")
+        store.compact()
+        with open(self.path) as f:
+            self.assertEqual(len(json.load(f)), 10)
+        self.assertEqual(os.path.getsize(store.log_path), 0)
+        store.close()
+
+    def test_interrupted_compaction_is_replayed(self):
+        store = self.open_store()
+        store.put("a", "https://a.example.com")
+        store.close()
+        # Crash after the log was rotated but before the snapshot landed.
+        os.remove(self.path)
+        with open(self.path + ".log.old", "w") as f:
+            f.write(json.dumps({"c": "b", "u": "https://b.example.com"}) + "\n")
+        reopened = self.open_store()
+        self.assertEqual(reopened.get("b"), "https://b.example.com")
+        reopened.compact()
+        self.assertFalse(os.path.exists(self.path + ".log.old"))
+        reopened.close()
+        final = self.open_store()
+        self.assertEqual(final.get("b"), "https://b.example.com")
+        final.close()
+
+    def test_torn_last_line_is_ignored(self):
+        store = self.open_store()
+        store.put("a", "https://a.example.com")
+        store.close()
+        with open(self.path + ".log", "a") as f:
+            f.write('{"c": "b", "u": "https://b.exa')
+        reopened = self.open_store()
+        self.assertEqual(reopened.get("a"), "https://a.example.com")
+        self.assertIsNone(reopened.get("b"))
+        reopened.put("c", "https://c.example.com")
+        self.assertEqual(self.open_store().get("c"), "https://c.example.com")
+        reopened.close()
+
+    def test_put_many_writes_in_bounded_slices(self):
+        store = self.open_store(write_slice=100)
+        writes = []
+        write = store._log.write
+        store._log.write = lambda data: writes.append(len(data)) or write(data)
+        pairs = ((f"code{i}", f"https://example.com/{i}") for i in range(1050))
+        with unittest.mock.patch("storage.os.fsync") as fsync:
+            store.put_many(pairs)
+        self.assertEqual(fsync.call_count, 1)
+        self.assertEqual(len(writes), 11)
+        self.assertLess(max(writes), 100 * 50)
+        store.close()
+        reopened = self.open_store()
+        self.assertEqual(len(reopened), 1050)
+        reopened.close()
+
+    def test_background_compaction_after_threshold(self):
+        store = self.open_store(compact_every=5)
+        for i in range(5):
+            store.put(f"code{i}", f"https://example.com/{i}")
+        for _ in range(100):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.01)
+        self.assertTrue(os.path.exists(self.path))
+        store.close()
+
+
+class TestSQLiteStore(unittest.TestCase):
+    """SQLite/WAL storage backend."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "urls.db")
+        self.store = SQLiteStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_put_and_get(self):
+        self.store.put("abc123", "https://example.com")
+        self.assertEqual(self.store.get("abc123"), "https://example.com")
+        self.assertIsNone(self.store.get("missing"))
+        self.assertIn("abc123", self.store)
+
+    def test_wal_mode(self):
+        mode = self.store._conn().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_visible_to_other_connections(self):
+        self.store.put("abc123", "https://example.com")
+        other = SQLiteStore(self.path)
+        self.assertEqual(other.get("abc123"), "https://example.com")
+        other.close()
+
+    def test_json_import_export_round_trip(self):
+        source = os.path.join(self.temp_dir, "in.json")
+        with open(source, "w") as f:
+            json.dump({"a": "https://a.example.com", "b": "https://b.example.com"}, f)
+        self.assertEqual(import_json(self.store, source, batch_size=1), 2)
+        self.assertEqual(len(self.store), 2)
+
+        target = os.path.join(self.temp_dir, "out.json")
+        export_json(self.store, target)
+        with open(target) as f:
+            self.assertEqual(json.load(f), {"a": "https://a.example.com",
+                                            "b": "https://b.example.com"})
+
+    def test_find_code_by_normalised_url(self):
+        self.store.put("abc1234", "HTTPS://Example.com:443")
+        self.assertEqual(self.store.find_code("https://example.com/"), "abc1234")
+        self.assertIsNone(self.store.find_code("https://example.com/other"))
+
+    def test_dedup_column_added_to_old_database(self):
+        self.store.close()
+        os.remove(self.path)
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE urls (code TEXT PRIMARY KEY, long_url TEXT NOT NULL) WITHOUT ROWID")
+        conn.execute("INSERT INTO urls VALUES ('old', 'https://old.example.com')")
+        conn.commit()
+        conn.close()
+        self.store = SQLiteStore(self.path)
+        self.assertEqual(self.store.get("old"), "https://old.example.com")
+        self.store.put("new", "https://new.example.com")
+        self.assertEqual(self.store.find_code("https://new.example.com"), "new")
+        self.assertIsNone(self.store.find_code("https://old.example.com"))
+        self.assertEqual(self.store.backfill_url_hashes(), 1)
+        self.assertEqual(self.store.backfill_url_hashes(), 0)
+        self.assertEqual(self.store.find_code("https://OLD.example.com/"), "old")
+
+    def test_expired_links_are_hidden_and_purged(self):
+        now = time.time()
+        self.store.put("gone", "https://gone.example.com", expires_at=now - 1)
+        self.store.put("soon", "https://soon.example.com", expires_at=now + 3600)
+        self.store.put("kept", "https://kept.example.com")
+        self.assertIsNone(self.store.get("gone"))
+        self.assertEqual(self.store.get_entry("soon"), ("https://soon.example.com", now + 3600))
+        self.assertEqual(self.store.purge_expired(now), ["gone"])
+        self.assertEqual(self.store.purge_expired(now + 7200), ["soon"])
+        self.assertEqual(self.store.get("kept"), "https://kept.example.com")
+
+    def test_expiring_links_are_not_reused(self):
+        self.store.put("temp", "https://example.com/", expires_at=time.time() + 60)
+        self.assertIsNone(self.store.find_code("https://example.com/"))
+
+    def test_lease_blocks_do_not_overlap(self):
+        first = self.store.lease_block(100)
+        other = SQLiteStore(self.path)
+        second = other.lease_block(100)
+        other.close()
+        self.assertEqual(first, (0, 100))
+        self.assertEqual(second, (100, 200))
+
+
+class TestExpiry(unittest.TestCase):
+    """Expiring links in the log store and the sweeper."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "urls.json")
+        self.store = LogStore(self.path, compact_interval=3600)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_expiry_survives_compaction_and_replay(self):
+        expires_at = time.time() + 3600
+        self.store.put("soon", "https://soon.example.com", expires_at)
+        self.store.put("gone", "https://gone.example.com", time.time() - 1)
+        self.store.compact()
+        self.store.close()
+        self.store = LogStore(self.path, compact_interval=3600)
+        self.assertEqual(self.store.get_entry("soon"), ("https://soon.example.com", expires_at))
+        self.assertNotIn("gone", self.store.mapping)
+
+    def test_purge_walks_only_expired_entries(self):
+        now = time.time()
+        for i in range(5):
+            self.store.put(f"e{i}", "https://example.com", now + i)
+        self.store.put("e0", "https://example.com")  # made permanent again
+        self.assertEqual(sorted(self.store.purge_expired(now + 2.5)), ["e1", "e2"])
+        self.assertIn("e0", self.store)
+
+    def test_expired_link_is_not_contained(self):
+        self.store.put("gone", "https://gone.example.com", time.time() - 1)
+        self.store.put("soon", "https://soon.example.com", time.time() + 3600)
+        self.assertNotIn("gone", self.store)
+        self.assertIn("soon", self.store)
+
+    def test_sweeper_invalidates_cache(self):
+        cache = RedirectCache()
+        self.store.put("gone", "https://gone.example.com", time.time() - 1)
+        cache.set("gone", "https://gone.example.com")
+        sweeper = ExpirySweeper(self.store, cache, interval=3600, batch_size=1)
+        self.assertEqual(sweeper.sweep(), 1)
+        self.assertIs(cache.get("gone"), MISS)
+        sweeper.close()
+
+    def test_sweeper_backfills_dedup_index_in_batches(self):
+        path = os.path.join(self.temp_dir, "urls.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE urls (code TEXT PRIMARY KEY, long_url TEXT NOT NULL) WITHOUT ROWID")
+        conn.executemany("INSERT INTO urls VALUES (?, ?)",
+                         [(f"old{i}", f"https://old.example.com/{i}") for i in range(5)])
+        conn.commit()
+        conn.close()
+        store = SQLiteStore(path)
+        sweeper = ExpirySweeper(store, interval=3600, batch_size=2)
+        self.assertEqual(sweeper.backfill(), 5)
+        self.assertEqual(sweeper.backfill(), 0)
+        sweeper.close()
+        self.assertEqual(store.find_code("https://old.example.com/4"), "old4")
+        store.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_sweeper_runs_in_forked_child(self):
+        store = SQLiteStore(os.path.join(self.temp_dir, "urls.db"))
+        store.put("gone", "https://gone.example.com", time.time() + 0.1)
+        sweeper = ExpirySweeper(store, interval=0.05)
+        pid = os.fork()
+        if pid == 0:
+            time.sleep(0.5)
+            os._exit(0 if sweeper.purged == 1 else 1)
+        sweeper.close()  # leave the expired link to the child
+        _, status = os.waitpid(pid, 0)
+        store.close()
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+class TestNormalizeUrl(unittest.TestCase):
+    """URL normalisation for the dedup index."""
+
+    def test_equivalent_urls(self):
+        self.assertEqual(normalize_url("HTTP://Example.COM:80"), "http://example.com/")
+        self.assertEqual(normalize_url("https://example.com:8443/a?b=1"),
+                         "https://example.com:8443/a?b=1")
+
+    def test_path_and_query_are_kept(self):
+        self.assertNotEqual(normalize_url("https://example.com/A"),
+                            normalize_url("https://example.com/a"))
+
+    def test_log_store_index_rebuilt_on_replay(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "urls.json")
+            store = LogStore(path, compact_interval=3600)
+            store.put("a", "https://a.example.com/x")
+            reopened = LogStore(path, compact_interval=3600)
+            self.assertEqual(reopened.find_code("HTTPS://A.example.com/x"), "a")
+            reopened.close()
+            store.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestCodeAllocator(unittest.TestCase):
+    """Block-leased base62 code allocation."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "urls.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_base62_round_trip(self):
+        for number in (0, 1, 61, 62, 123456789, KEYSPACE - 1):
+            code = encode_base62(number)
+            self.assertEqual(len(code), CODE_LENGTH)
+            self.assertEqual(decode_base62(code), number)
+
+    def test_permutation_is_collision_free(self):
+        codes = {permute(n) for n in range(100000)}
+        self.assertEqual(len(codes), 100000)
+
+    def test_leases_survive_restart_and_compaction(self):
+        store = LogStore(self.path, compact_interval=3600)
+        allocator = CodeAllocator(store, block_size=10)
+        first = {allocator.next_code() for _ in range(25)}
+        store.compact()
+        store.close()
+
+        reopened = LogStore(self.path, compact_interval=3600)
+        allocator = CodeAllocator(reopened, block_size=10)
+        second = {allocator.next_code() for _ in range(25)}
+        reopened.close()
+        self.assertEqual(len(first | second), 50)
+
+    def test_next_codes_uses_one_lease(self):
+        store = LogStore(self.path, compact_interval=3600)
+        allocator = CodeAllocator(store, block_size=10, scramble=False)
+        allocator.next_code()
+        codes = allocator.next_codes(50)
+        self.assertEqual(len(set(codes)), 50)
+        self.assertEqual(store.next_id, 60)
+        store.close()
+
+    def test_sequential_codes_when_not_scrambled(self):
+        store = LogStore(self.path, compact_interval=3600)
+        allocator = CodeAllocator(store, block_size=10, scramble=False)
+        self.assertEqual([allocator.next_code() for _ in range(2)], ["0000000", "0000001"])
+        store.close()
+
+
+class TestRedirectCache(unittest.TestCase):
+    """LRU + negative caching."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = RedirectCache(capacity=2, negative_ttl=10, clock=lambda: self.now)
+
+    def test_lru_eviction(self):
+        self.cache.set("a", "https://a.example.com")
+        self.cache.set("b", "https://b.example.com")
+        self.cache.get("a")  # "b" is now least recently used
+        self.cache.set("c", "https://c.example.com")
+        self.assertIs(self.cache.get("b"), MISS)
+        self.assertEqual(self.cache.get("a"), "https://a.example.com")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_negative_entry_expires(self):
+        self.cache.set_missing("zzz")
+        self.assertIsNone(self.cache.get("zzz"))
+        self.now = 11
+        self.assertIs(self.cache.get("zzz"), MISS)
+        stats = self.cache.stats()
+        self.assertEqual((stats["negative_hits"], stats["misses"]), (1, 1))
+
+    def test_expired_entry_is_not_served(self):
+        self.cache.set("old", "https://old.example.com", expires_at=time.time() - 1)
+        self.assertIs(self.cache.get("old"), MISS)
+
+    def test_set_replaces_negative_entry(self):
+        self.cache.set_missing("new")
+        self.cache.set("new", "https://new.example.com")
+        self.assertEqual(self.cache.get("new"), "https://new.example.com")
+
+
+class TestClickRecorder(unittest.TestCase):
+    """Buffered click analytics."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "clicks.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_rollups_are_shared_through_the_database(self):
+        worker_a = ClickRecorder(self.path, flush_interval=3600)
+        worker_b = ClickRecorder(self.path, flush_interval=3600)
+        for _ in range(3):
+            worker_a.record("abc")
+        worker_b.record("abc")
+        worker_a.flush()
+        worker_b.flush()
+        self.assertEqual(worker_a.stats("abc")["clicks"], 4)
+        self.assertEqual(worker_b.stats("abc")["clicks"], 4)
+        worker_a.close()
+        worker_b.close()
+
+    def test_rollups_survive_restart(self):
+        recorder = ClickRecorder(self.path, flush_interval=3600)
+        recorder.record("abc", "https://example.org/")
+        recorder.close()
+        reopened = ClickRecorder(self.path, flush_interval=3600)
+        self.assertEqual(reopened.stats("abc")["referrers"], {"example.org": 1})
+        self.assertIsNone(reopened.stats("other"))
+        reopened.close()
+
+    def test_hourly_histogram_is_sorted(self):
+        recorder = ClickRecorder(self.path, flush_interval=3600)
+        for hour in (5, 3, 4, 3):
+            recorder._pending.append(("abc", None, hour * 3600))
+        recorder.flush()
+        self.assertEqual(recorder.stats("abc")["hourly"],
+                         {"1970-01-01T03:00Z": 2, "1970-01-01T04:00Z": 1,
+                          "1970-01-01T05:00Z": 1})
+        recorder.close()
+
+    def test_import_legacy_log(self):
+        log = os.path.join(self.temp_dir, "clicks.jsonl")
+        delta = {"code": "abc", "clicks": 2, "referrers": {"(direct)": 2},
+                 "hourly": {"2025-10-05T14:00Z": 2}}
+        with open(log, "w") as f:
+            f.write(json.dumps(delta) + "\n" + json.dumps(delta) + "\n" + '{"code": "ab')
+        recorder = ClickRecorder(self.path, flush_interval=3600)
+        self.assertEqual(recorder.import_log(log), 2)
+        self.assertEqual(recorder.stats("abc"), {"clicks": 4, "referrers": {"(direct)": 4},
+                                                 "hourly": {"2025-10-05T14:00Z": 4}})
+        recorder.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_flusher_runs_in_forked_child(self):
+        """Clicks recorded in a preforked worker are flushed without an explicit flush()."""
+        recorder = ClickRecorder(self.path, flush_interval=0.05)
+        pid = os.fork()
+        if pid == 0:
+            recorder.record("forked")
+            time.sleep(0.5)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(recorder.stats("forked")["clicks"], 1)
+        recorder.close()
+
+
+class AppTestCase(unittest.TestCase):
+    """Runs the app against a temporary SQLite database."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.temp_dir, "urls.json")
+        with open(self.data_file, "w") as f:
+            json.dump({"legacy": "https://legacy.example.com"}, f)
+        url_shortener.configure(backend="sqlite",
+                                db_file=os.path.join(self.temp_dir, "urls.db"),
+                                data_file=self.data_file,
+                                clicks_db=os.path.join(self.temp_dir, "clicks.db"),
+                                clicks_file=os.path.join(self.temp_dir, "clicks.jsonl"))
+        self.client = url_shortener.app.test_client()
+
+    def tearDown(self):
+        url_shortener.sweeper.close()
+        url_shortener.store.close()
+        url_shortener.clicks.close()
+        shutil.rmtree(self.temp_dir)
+
+
+class TestApp(AppTestCase):
+    """Flask routes."""
+
+    def test_legacy_json_is_imported_into_new_database(self):
+        response = self.client.get("/legacy")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers["Location"], "https://legacy.example.com")
+
+    def test_legacy_click_log_is_imported_into_new_database(self):
+        legacy = os.path.join(self.temp_dir, "old-clicks.jsonl")
+        with open(legacy, "w") as f:
+            f.write(json.dumps({"code": "legacy", "clicks": 3, "referrers": {"(direct)": 3},
+                                "hourly": {"2025-10-05T14:00Z": 3}}) + "\n")
+        url_shortener.configure(backend="sqlite",
+                                db_file=os.path.join(self.temp_dir, "urls.db"),
+                                data_file=self.data_file,
+                                clicks_db=os.path.join(self.temp_dir, "clicks-new.db"),
+                                clicks_file=legacy)
+        self.assertEqual(self.client.get("/stats/legacy").get_json()["clicks"], 3)
+
+    def test_shorten_then_redirect(self):
+        response = self.client.post("/", data={"long_url": "https://example.com/page"})
+        self.assertEqual(response.status_code, 200)
+        code = re.search(r'href="http://localhost/(\w+)"', response.get_data(as_text=True)).group(1)
+        self.assertEqual(len(code), CODE_LENGTH)
+        response = self.client.get("/" + code)
+        self.assertEqual(response.headers["Location"], "https://example.com/page")
+
+    def test_unknown_code(self):
+        self.assertEqual(self.client.get("/nope").status_code, 404)
+
+    def test_batch_json_list(self):
+        urls = [f"https://example.com/{i}" for i in range(2500)]
+        response = self.client.post("/api/batch", json={"urls": urls})
+        self.assertEqual(response.status_code, 200)
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([r["long_url"] for r in results], urls)
+        self.assertEqual(len({r["code"] for r in results}), len(urls))
+        last = results[-1]
+        self.assertEqual(url_shortener.store.get(last["code"]), last["long_url"])
+        self.assertTrue(last["short_url"].endswith("/" + last["code"]))
+
+    def test_batch_streamed_lines(self):
+        body = "https://a.example.com\n\n\"https://b.example.com\"\n"
+        response = self.client.post("/api/batch", data=body,
+                                    content_type="application/x-ndjson")
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([r["long_url"] for r in results],
+                         ["https://a.example.com", "https://b.example.com"])
+
+    def test_repeat_submission_reuses_code(self):
+        first = self.client.post("/", data={"long_url": "https://example.com/same"})
+        second = self.client.post("/", data={"long_url": "https://EXAMPLE.com/same"})
+        pattern = r'href="http://localhost/(\w+)"'
+        self.assertEqual(re.search(pattern, first.get_data(as_text=True)).group(1),
+                         re.search(pattern, second.get_data(as_text=True)).group(1))
+
+    def test_batch_reuses_existing_codes(self):
+        response = self.client.post("/api/batch", json=["https://legacy.example.com",
+                                                         "https://fresh.example.com"])
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(results[0]["code"], "legacy")
+        self.assertEqual(url_shortener.store.get(results[1]["code"]), "https://fresh.example.com")
+
+    def test_batch_repeats_share_a_code(self):
+        urls = ["https://dup.example.com/x", "https://fresh.example.com",
+                "https://DUP.example.com/x", "https://legacy.example.com",
+                "https://legacy.example.com"]
+        response = self.client.post("/api/batch", json=urls)
+        codes = [json.loads(line)["code"]
+                 for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(codes[0], codes[2])
+        self.assertEqual(codes[3:], ["legacy", "legacy"])
+        self.assertEqual(len(set(codes)), 3)
+        self.assertEqual(url_shortener.store.get(codes[0]), "https://dup.example.com/x")
+
+        # Repeats further apart than one chunk share a code too.
+        urls = [f"https://far.example.com/{i}" for i in range(url_shortener.BATCH_CHUNK + 600)]
+        urls[-1] = urls[0]
+        response = self.client.post("/api/batch", data="\n".join(urls),
+                                    content_type="text/plain")
+        codes = [json.loads(line)["code"]
+                 for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(codes[-1], codes[0])
+        self.assertEqual(len(set(codes)), len(urls) - 1)
+
+        response = self.client.post("/api/batch?ttl_days=1", json=urls[:1] * 2)
+        codes = [json.loads(line)["code"]
+                 for line in response.get_data(as_text=True).splitlines()]
+        self.assertNotEqual(codes[0], codes[1])
+
+    def test_expiring_link(self):
+        response = self.client.post("/", data={"long_url": "https://legacy.example.com",
+                                               "ttl_days": "7"})
+        code = re.search(r'href="http://localhost/(\w+)"', response.get_data(as_text=True)).group(1)
+        self.assertNotEqual(code, "legacy")
+        long_url, expires_at = url_shortener.store.get_entry(code)
+        self.assertAlmostEqual(expires_at - time.time(), 7 * 86400, delta=60)
+        self.assertEqual(self.client.post("/", data={"long_url": "https://x.example.com",
+                                                     "ttl_days": "-1"}).status_code, 400)
+
+    def test_unbounded_ttl_is_rejected(self):
+        for ttl in ("inf", "nan", "1e308", str(url_shortener.MAX_TTL_DAYS + 1)):
+            self.assertEqual(self.client.post("/", data={"long_url": "https://x.example.com",
+                                                         "ttl_days": ttl}).status_code, 400, ttl)
+            response = self.client.post(f"/api/batch?ttl_days={ttl}", json=["https://x.example.com"])
+            self.assertEqual(response.status_code, 400, ttl)
+        response = self.client.post(f"/api/batch?ttl_days={url_shortener.MAX_TTL_DAYS}",
+                                    json=["https://x.example.com"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_with_ttl(self):
+        response = self.client.post("/api/batch?ttl_days=1", json=["https://a.example.com"])
+        code = json.loads(response.get_data(as_text=True))["code"]
+        self.assertIsNotNone(url_shortener.store.get_entry(code)[1])
+
+    def test_batch_rejects_bad_json(self):
+        response = self.client.post("/api/batch", json={"links": []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_rejects_non_url_entries(self):
+        before = len(url_shortener.store)
+        for body in ([None], [5], ["https://a.example.com", ""], ["  "], [["x"]]):
+            response = self.client.post("/api/batch", json=body)
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.post("/api/batch", data='https://a.example.com\n""\n',
+                                    content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Line 2", response.get_json()["error"])
+        self.assertEqual(len(url_shortener.store), before)
+
+    def test_large_json_batch_is_refused(self):
+        urls = ["https://example.com/" + "x" * 1000] * 3000
+        response = self.client.post("/api/batch", json=urls)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("one URL per line", response.get_json()["error"])
+
+    def test_click_stats(self):
+        self.client.get("/legacy", headers={"Referer": "https://news.example.org/item"})
+        self.client.get("/legacy")
+        self.assertEqual(self.client.get("/stats/legacy").get_json()["clicks"], 0)
+        url_shortener.clicks.flush()
+        stats = self.client.get("/stats/legacy").get_json()
+        self.assertEqual(stats["clicks"], 2)
+        self.assertEqual(stats["referrers"], {"news.example.org": 1, "(direct)": 1})
+        self.assertEqual(sum(stats["hourly"].values()), 2)
+        self.assertEqual(self.client.get("/stats/nope").status_code, 404)
+
+    def test_form_page_is_cached(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertEqual(self.client.get("/", headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_cache_stats_endpoint(self):
+        self.client.get("/legacy")
+        self.client.get("/legacy")
+        self.client.get("/nope")
+        self.client.get("/nope")
+        stats = self.client.get("/api/cache-stats").get_json()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["negative_hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+
+class TestAsgi(AppTestCase):
+    """Native ASGI fast paths."""
+
+    def call(self, path, method="GET", headers=()):
+        scope = {"type": "http", "method": method, "path": path,
+                 "headers": [(k.lower().encode(), v.encode()) for k, v in headers]}
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(asgi.app(scope, receive, send))
+        start = messages[0]
+        return start["status"], dict(start["headers"]), messages[1].get("body", b"")
+
+    def test_asgi_redirect(self):
+        status, headers, _ = self.call("/legacy", headers=[("Referer", "https://ref.example.org/")])
+        self.assertEqual(status, 302)
+        self.assertEqual(headers[b"location"], b"https://legacy.example.com")
+        url_shortener.clicks.flush()
+        self.assertEqual(url_shortener.clicks.stats("legacy")["referrers"], {"ref.example.org": 1})
+
+    def test_asgi_unknown_code(self):
+        self.assertEqual(self.call("/nope")[0], 404)
+
+    def test_asgi_store_lookup_runs_off_event_loop(self):
+        threads = []
+        get_entry = url_shortener.store.get_entry
+
+        def recording_get_entry(code):
+            threads.append(threading.get_ident())
+            return get_entry(code)
+
+        with unittest.mock.patch.object(url_shortener.store, "get_entry", recording_get_entry):
+            self.assertEqual(self.call("/legacy")[0], 302)  # miss: store lookup
+            self.assertEqual(self.call("/legacy")[0], 302)  # hit: cache only
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+    def test_asgi_form_page(self):
+        status, headers, body = self.call("/")
+        self.assertEqual((status, body), (200, url_shortener.FORM_PAGE))
+        self.assertEqual(self.call("/", headers=[("If-None-Match", headers[b"etag"].decode())])[0],
+                         304)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Smoke test of the load-test harness."""
+
+    def test_small_run_writes_report(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            out = os.path.join(temp_dir, "bench.json")
+            args = benchmark.build_parser().parse_args(
+                ["--mappings", "300", "--requests", "400", "--shorten-rate", "0.1",
+                 "--config", "sqlite:cache=50", "--config", "log:cache=0", "--out", out])
+            benchmark.run(args)
+            with open(out) as f:
+                report = json.load(f)
+            self.assertEqual([r["config"] for r in report["results"]],
+                             ["sqlite:cache=50", "log:cache=0"])
+            for result in report["results"]:
+                self.assertEqual(result["errors"], 0)
+                self.assertEqual(result["overall"]["count"], 400)
+                self.assertIsNotNone(result["redirect"]["p999_ms"])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_run_leaves_nothing_in_cwd(self):
+        temp_dir = tempfile.mkdtemp()
+        env = {k: v for k, v in os.environ.items() if not k.startswith("URL_")}
+        try:
+            subprocess.run([sys.executable, os.path.abspath(benchmark.__file__),
+                            "--mappings", "50", "--requests", "50",
+                            "--config", "sqlite:cache=0", "--analytics", "--out", "bench.json"],
+                           cwd=temp_dir, env=env, check=True, capture_output=True)
+            self.assertEqual(os.listdir(temp_dir), ["bench.json"])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_workload_is_reproducible(self):
+        codes = [f"c{i}" for i in range(100)]
+        first = benchmark.build_workload(codes, 1000, 1.2, 0.05, seed=7)
+        self.assertEqual(first, benchmark.build_workload(codes, 1000, 1.2, 0.05, seed=7))
+        redirects = [code for kind, code in first if kind == "redirect"]
+        self.assertGreater(redirects.count("c0"), redirects.count("c99"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,26 +1,113 @@
 # url_shortener.py
-from flask import Flask, redirect, request, render_template_string
-import random
-import string
+from flask import Flask, Response, jsonify, redirect, request
+import hashlib
 import json
 import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from analytics import ClickRecorder
+from cache import MISS, RedirectCache
+from codegen import CodeAllocator
+from expiry import ExpirySweeper
+from storage import open_store, import_json, export_json, url_hash
 
 app = Flask(__name__)
 DATA_FILE = "urls.json"
 
-# Load saved URLs
-if os.path.exists(DATA_FILE):
-    with open(DATA_FILE, "r") as f:
-        url_mapping = json.load(f)
-else:
-    url_mapping = {}
+# Storage backend, chosen with environment variables:
+#   URL_STORE          "sqlite" (default, shared by all workers) or "log"
+#   URL_DB             database path for the sqlite backend
+#   URL_DB_CACHE_KIB   sqlite page cache size per connection, in KiB
+# urls.json is only read to seed a brand-new database and is otherwise an
+# import/export format (see --import / --export below).
+STORE_BACKEND = os.environ.get("URL_STORE", "sqlite")
+DB_FILE = os.environ.get("URL_DB", "urls.db")
+DB_CACHE_KIB = int(os.environ.get("URL_DB_CACHE_KIB", "16384"))
+
+# Hot-redirect cache in front of the store:
+#   URL_CACHE_SIZE     max cached codes per worker (0 disables the cache)
+#   URL_NEGATIVE_TTL   seconds an unknown code is remembered as a 404
+CACHE_SIZE = int(os.environ.get("URL_CACHE_SIZE", "100000"))
+NEGATIVE_TTL = float(os.environ.get("URL_NEGATIVE_TTL", "30"))
+
+# Short-code allocation:
+#   URL_CODE_BLOCK     IDs each worker leases from the store at a time
+#   URL_SCRAMBLE       "0" to hand out codes in plain sequential order
+CODE_BLOCK = int(os.environ.get("URL_CODE_BLOCK", "1000"))
+SCRAMBLE_CODES = os.environ.get("URL_SCRAMBLE", "1") != "0"
+
+# Batch API: URLs are handled BATCH_CHUNK at a time, and the code/URL pairs
+# are spooled to a temp file (in memory up to BATCH_SPOOL_BYTES) between
+# allocation, the single commit and the streamed response.
+BATCH_CHUNK = 1000
+BATCH_SPOOL_BYTES = 4 * 1024 * 1024
+MAX_BATCH = int(os.environ.get("URL_MAX_BATCH", "1000000"))
+# A JSON body is parsed in one piece, so it is only for small batches;
+# anything bigger must be sent as one URL per line.
+MAX_JSON_BATCH_BYTES = 2 * 1024 * 1024
+
+# Click analytics, recorded off the redirect path and flushed in the background:
+#   URL_ANALYTICS      "0" to disable
+#   URL_CLICKS_DB      SQLite database the rollups are added to
+#   URL_CLICKS_FILE    JSONL click log of older versions, only read to seed
+#                      a brand-new URL_CLICKS_DB
+ANALYTICS = os.environ.get("URL_ANALYTICS", "1") != "0"
+CLICKS_DB = os.environ.get("URL_CLICKS_DB", "clicks.db")
+CLICKS_FILE = os.environ.get("URL_CLICKS_FILE", "clicks.jsonl")
+
+# Expiring links: seconds between sweeps that reclaim expired links, and the
+# longest lifetime a link may be given.
+EXPIRY_SWEEP_INTERVAL = float(os.environ.get("URL_EXPIRY_SWEEP", "60"))
+MAX_TTL_DAYS = 36500
+
+store = None
+redirect_cache = None
+code_allocator = None
+clicks = None
+sweeper = None
+
+
+def configure(backend=STORE_BACKEND, db_file=DB_FILE, data_file=DATA_FILE,
+              cache_size_kib=DB_CACHE_KIB, cache_size=CACHE_SIZE,
+              negative_ttl=NEGATIVE_TTL, code_block=CODE_BLOCK,
+              scramble_codes=SCRAMBLE_CODES, analytics=ANALYTICS, clicks_db=CLICKS_DB,
+              clicks_file=CLICKS_FILE, sweep_interval=EXPIRY_SWEEP_INTERVAL):
+    """(Re)open the storage backend, cache, code allocator, analytics and sweeper."""
+    global store, redirect_cache, code_allocator, clicks, sweeper
+    if sweeper is not None:
+        sweeper.close()
+    redirect_cache = RedirectCache(capacity=cache_size, negative_ttl=negative_ttl)
+    if clicks is not None:
+        clicks.close()
+    clicks = None
+    if analytics:
+        fresh = not os.path.exists(clicks_db)
+        clicks = ClickRecorder(clicks_db)
+        if fresh and os.path.exists(clicks_file):
+            count = clicks.import_log(clicks_file)
+            print(f"Imported {count} click rollups from {clicks_file} into {clicks_db}")
+    if store is not None:
+        store.close()
+    if backend == "sqlite":
+        fresh = not os.path.exists(db_file)
+        store = open_store("sqlite", db_file, cache_size_kib=cache_size_kib)
+        if fresh and os.path.exists(data_file):
+            count = import_json(store, data_file)
+            print(f"Imported {count} URLs from {data_file} into {db_file}")
+    else:
+        store = open_store(backend, data_file)
+    code_allocator = CodeAllocator(store, block_size=code_block, scramble=scramble_codes)
+    sweeper = ExpirySweeper(store, redirect_cache, interval=sweep_interval)
+    return store
 
-def save_urls():
-    with open(DATA_FILE, "w") as f:
-        json.dump(url_mapping, f)
+
+configure()
 
 def generate_code():
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=6))
+    return code_allocator.next_code()
 
 # Improved HTML template
 HTML_TEMPLATE = """
@@ -53,7 +140,7 @@ HTML_TEMPLATE = """
         margin-bottom: 20px;
         color: #333;
     }
-    input[type="text"] {
+    input[type="text"], input[type="number"] {
         width: 80%;
         padding: 10px;
         margin-bottom: 20px;
@@ -94,6 +181,8 @@ HTML_TEMPLATE = """
     <form method="POST">
         <input type="text" name="long_url" placeholder="Enter your long URL" required>
         <br>
+        <input type="number" name="ttl_days" placeholder="Expires after N days (optional)" min="0" step="any">
+        <br>
         <input type="submit" value="Shorten">
     </form>
     {% if short_url %}
@@ -106,23 +195,219 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once at import; the GET form never changes, so it is rendered
+# once too and served from memory with an ETag.
+FORM_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+FORM_PAGE = FORM_TEMPLATE.render(short_url=None).encode("utf-8")
+FORM_ETAG = hashlib.sha1(FORM_PAGE).hexdigest()
+
+
+def form_page_response():
+    response = Response(FORM_PAGE, mimetype="text/html")
+    response.set_etag(FORM_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+
+def lookup(code):
+    """Resolve a code through the redirect cache; returns the long URL or None."""
+    long_url = redirect_cache.get(code)
+    if long_url is MISS:
+        long_url = lookup_store(code)
+    return long_url
+
+
+def lookup_store(code):
+    """Resolve a cache miss from the store and cache the answer (may block on I/O)."""
+    entry = store.get_entry(code)
+    if entry:
+        redirect_cache.set(code, entry[0], entry[1])
+        return entry[0]
+    redirect_cache.set_missing(code)
+    return None
+
+
 @app.route("/", methods=["GET", "POST"])
 def home():
-    short_url = None
-    if request.method == "POST":
-        long_url = request.form["long_url"]
+    if request.method == "GET":
+        return form_page_response()
+    long_url = request.form["long_url"]
+    try:
+        expires_at = parse_expiry(request.form.get("ttl_days"))
+    except ValueError:
+        return "Invalid expiry", 400
+    # Only permanent links are shared; an expiring link always gets
+    # its own code so its TTL cannot shorten or extend another link.
+    code = store.find_code(long_url) if expires_at is None else None
+    if code is None:
         code = generate_code()
-        url_mapping[code] = long_url
-        save_urls()
-        short_url = request.host_url + code
-    return render_template_string(HTML_TEMPLATE, short_url=short_url)
+        store.put(code, long_url, expires_at)
+        redirect_cache.invalidate(code)
+    short_url = request.host_url + code
+    return FORM_TEMPLATE.render(short_url=short_url)
 
 @app.route("/<code>")
 def redirect_short_url(code):
-    long_url = url_mapping.get(code)
+    long_url = lookup(code)
     if long_url:
+        if clicks is not None:
+            clicks.record(code, request.referrer)
         return redirect(long_url)
     return "URL not found", 404
 
+@app.route("/stats/<code>")
+def code_stats(code):
+    if clicks is None:
+        return jsonify({"error": "Analytics is disabled"}), 404
+    stats = clicks.stats(code)
+    if stats is None:
+        if store.get(code) is None:
+            return jsonify({"error": "URL not found"}), 404
+        stats = {"clicks": 0, "referrers": {}, "hourly": {}}
+    return jsonify(dict(stats, code=code))
+
+def parse_expiry(ttl_days):
+    """Turn an optional "expires after N days" value into a Unix timestamp."""
+    if ttl_days in (None, ""):
+        return None
+    days = float(ttl_days)
+    if not 0 < days <= MAX_TTL_DAYS:  # also rejects nan and inf
+        raise ValueError(f"ttl_days must be between 0 and {MAX_TTL_DAYS}")
+    return time.time() + days * 86400
+
+
+def iter_batch_urls():
+    """Yield long URLs from a batch request body.
+
+    Accepts a JSON list (or {"urls": [...]}) for small batches (up to
+    MAX_JSON_BATCH_BYTES), or, for large ones, a streamed body with one URL
+    (plain or JSON-quoted) per line; blank lines are skipped. Entries that
+    are not strings, or are blank, raise ValueError.
+    """
+    if request.is_json:
+        if request.content_length is None or request.content_length > MAX_JSON_BATCH_BYTES:
+            raise ValueError(f"JSON batches are for small batches (at most "
+                             f"{MAX_JSON_BATCH_BYTES // 1024} KiB with a Content-Length); "
+                             "send larger batches as text with one URL per line")
+        payload = request.get_json(silent=True)
+        urls = payload.get("urls") if isinstance(payload, dict) else payload
+        if not isinstance(urls, list):
+            raise ValueError('Expected a JSON list of URLs or {"urls": [...]}')
+        for index, long_url in enumerate(urls):
+            if not isinstance(long_url, str) or not long_url.strip():
+                raise ValueError(f"Entry {index} is not a URL: {json.dumps(long_url)}")
+            yield long_url
+        return
+    for number, raw in enumerate(request.stream, 1):
+        line = raw.decode("utf-8").strip()
+        if not line:
+            continue
+        long_url = json.loads(line) if line.startswith('"') else line
+        if not isinstance(long_url, str) or not long_url.strip():
+            raise ValueError(f"Line {number} is not a URL: {line}")
+        yield long_url
+
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_spool(spool):
+    spool.seek(0)
+    for line in spool:
+        yield json.loads(line)
+
+
+@app.route("/api/batch", methods=["POST"])
+def batch_shorten():
+    """Shorten many URLs in one call; responds with JSON lines.
+
+    ``?ttl_days=N`` makes every link in the batch expire after N days.
+    """
+    try:
+        expires_at = parse_expiry(request.args.get("ttl_days"))
+    except ValueError:
+        return jsonify({"error": f"ttl_days must be a positive number of at most "
+                                 f"{MAX_TTL_DAYS} days"}), 400
+    spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES, mode="w+",
+                                          encoding="utf-8")
+    # Codes handed out earlier in this batch, which the store cannot see
+    # until put_many() runs. A private temporary database: kept in memory
+    # while small and spilled to disk like the spool.
+    batch_codes = sqlite3.connect("")
+    batch_codes.execute("CREATE TABLE fresh (url_hash BLOB PRIMARY KEY, code TEXT NOT NULL) "
+                        "WITHOUT ROWID")
+    count = 0
+    try:
+        for chunk in iter_chunks(iter_batch_urls(), BATCH_CHUNK):
+            count += len(chunk)
+            if count > MAX_BATCH:
+                raise ValueError(f"Batch too large (max {MAX_BATCH} URLs)")
+            # URLs shortened before reuse their code; the rest get fresh
+            # ones, shared by every repeat of the same URL in the batch.
+            # Expiring links always get their own code.
+            if expires_at is None:
+                keys = [url_hash(long_url) for long_url in chunk]
+                known = {}  # url_hash -> existing code, or None if new
+                for key, long_url in zip(keys, chunk):
+                    if key not in known:
+                        row = batch_codes.execute("SELECT code FROM fresh WHERE url_hash = ?",
+                                                  (key,)).fetchone()
+                        known[key] = row[0] if row else store.find_code(long_url)
+                new_keys = [key for key, code in known.items() if code is None]
+                fresh = dict(zip(new_keys, code_allocator.next_codes(len(new_keys))))
+                batch_codes.executemany("INSERT INTO fresh VALUES (?, ?)", fresh.items())
+                for key, long_url in zip(keys, chunk):
+                    code = fresh.pop(key, None)
+                    if code is not None:
+                        known[key] = code
+                        spool.write(json.dumps([code, long_url, True]) + "\n")
+                    else:
+                        spool.write(json.dumps([known[key], long_url, False]) + "\n")
+            else:
+                for code, long_url in zip(code_allocator.next_codes(len(chunk)), chunk):
+                    spool.write(json.dumps([code, long_url, True]) + "\n")
+    except ValueError as e:
+        spool.close()
+        return jsonify({"error": str(e)}), 400
+    finally:
+        batch_codes.close()
+
+    # One transaction (SQLite) or one fsync (log) for the whole batch.
+    store.put_many(((code, long_url) for code, long_url, new in read_spool(spool) if new),
+                   expires_at)
+
+    host_url = request.host_url
+
+    def generate():
+        try:
+            for code, long_url, new in read_spool(spool):
+                if new:
+                    redirect_cache.invalidate(code)
+                yield json.dumps({"code": code, "short_url": host_url + code,
+                                  "long_url": long_url}) + "\n"
+        finally:
+            spool.close()
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@app.route("/api/cache-stats")
+def cache_stats():
+    return jsonify(redirect_cache.stats())
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    if len(sys.argv) == 3 and sys.argv[1] == "--import":
+        print(f"Imported {import_json(store, sys.argv[2])} URLs from {sys.argv[2]}")
+    elif len(sys.argv) == 3 and sys.argv[1] == "--export":
+        export_json(store, sys.argv[2])
+        print(f"Exported URLs to {sys.argv[2]}")
+    else:
+        app.run(debug=True)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmark and regression suite for the currency converter.
+
+Measures:
+
+- single conversion latency, with and without history recording (the
+  difference is reported as the history overhead)
+- batch conversion throughput of ``convert_many`` across batch sizes
+- cache load time (reading the cache file and building the cross-rate
+  matrix) against the number of currencies
+
+Every measurement is repeated with ``timeit.repeat`` and summarized as
+min/median/mean/stdev; the median is the tracked value. Results are written
+as JSON. A saved baseline can be compared against a new run, and the exit
+status is 1 when any tracked metric is worse than the baseline by more than
+``--threshold``, so CI can fail on regressions.
+
+Examples:
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --compare bench_baseline.json --threshold 0.25
+    python benchmark.py --quick --out bench_results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from currency_converter import CurrencyConverter  # noqa: E402
+
+BATCH_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+CURRENCY_COUNTS = [10, 170, 1_000]
+QUICK_BATCH_SIZES = [1_000, 10_000]
+QUICK_CURRENCY_COUNTS = [10, 170]
+
+
+def summarize(timings, per_call, unit="us", scale=1e6, higher_is_better=False):
+    """Statistics over repeats; ``value`` (the median) is the tracked number.
+
+    ``timings`` are seconds per repeat of ``per_call`` operations. Latencies
+    are reported as time per operation times ``scale``; throughputs
+    (``higher_is_better``) as operations per second.
+    """
+    per_op = [t / per_call for t in timings]
+    values = sorted(1 / t for t in per_op) if higher_is_better else sorted(t * scale for t in per_op)
+    return {
+        "value": statistics.median(values),
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "tracked": True,
+        "min": values[0],
+        "max": values[-1],
+        "mean": statistics.mean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "repeats": len(values),
+    }
+
+
+def make_rates(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"C{i:04d}": float(rate) for i, rate in enumerate(rng.uniform(0.01, 1000, count))}
+
+
+def bench_single(converter, repeat, number):
+    results = {}
+    for name, record in (("single_conversion", False), ("single_conversion_with_history", True)):
+        timings = timeit.repeat(
+            lambda record=record: converter.convert_currency(100, "EUR", "JPY",
+                                                             record_history=record),
+            repeat=repeat, number=number)
+        results[name] = summarize(timings, number)
+    converter.save_history()
+    # A difference of two medians is too noisy to gate on; reported only.
+    results["history_overhead"] = {
+        "value": max(results["single_conversion_with_history"]["value"]
+                     - results["single_conversion"]["value"], 0.0),
+        "unit": "us",
+        "higher_is_better": False,
+        "tracked": False,
+    }
+    return results
+
+
+def bench_batch(converter, sizes, repeat):
+    results = {}
+    codes = np.array(converter.get_available_currencies())
+    rng = np.random.default_rng(1)
+    for size in sizes:
+        amounts = rng.uniform(1, 10_000, size)
+        from_codes = codes[rng.integers(0, len(codes), size)]
+        number = max(1, 100_000 // size)
+        timings = timeit.repeat(lambda: converter.convert_many(amounts, from_codes, "EUR"),
+                                repeat=repeat, number=number)
+        results[f"batch_throughput_{size}"] = summarize(timings, number * size, unit="rows/s",
+                                                        higher_is_better=True)
+    return results
+
+
+def bench_cache_load(temp_dir, counts, repeat):
+    results = {}
+    for count in counts:
+        cache_file = os.path.join(temp_dir, f"cache_{count}.json")
+        with open(cache_file, "w") as f:
+            json.dump({"rates": make_rates(count), "last_update": "2025-01-01T00:00:00",
+                       "base_currency": "USD"}, f)
+
+        def load():
+            converter = CurrencyConverter(history_enabled=False)
+            converter.cache_file = cache_file
+            converter.rate_table  # reads the file and builds the matrix
+
+        timings = timeit.repeat(load, repeat=repeat, number=5)
+        results[f"cache_load_{count}"] = summarize(timings, 5, unit="ms", scale=1e3)
+    return results
+
+
+def run(args):
+    temp_dir = tempfile.mkdtemp(prefix="currency-bench-")
+    try:
+        converter = CurrencyConverter()
+        converter.cache_file = os.path.join(temp_dir, "cache.json")
+        converter.history_file = os.path.join(temp_dir, "history.jsonl")
+        converter.exchange_rates = dict(make_rates(170), EUR=0.92, JPY=150.0)
+        converter.last_update = "2025-01-01T00:00:00"
+
+        metrics = {}
+        metrics.update(bench_single(converter, args.repeat, args.number))
+        metrics.update(bench_batch(converter,
+                                   QUICK_BATCH_SIZES if args.quick else BATCH_SIZES, args.repeat))
+        metrics.update(bench_cache_load(temp_dir,
+                                        QUICK_CURRENCY_COUNTS if args.quick else CURRENCY_COUNTS,
+                                        args.repeat))
+        converter.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "number": args.number,
+            "quick": args.quick,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Compare tracked metrics; returns (rows, regressions).
+
+    Each row is ``(name, baseline_value, current_value, change)`` where
+    ``change`` is the relative change, positive meaning worse. A metric
+    regresses when its change exceeds ``threshold`` (e.g. 0.2 for 20%).
+    Untracked metrics and those missing from either run are skipped.
+    """
+    rows, regressions = [], []
+    for name, metric in current["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if not metric.get("tracked", True) or base is None or not base["value"]:
+            continue
+        change = (metric["value"] - base["value"]) / base["value"]
+        if metric["higher_is_better"]:
+            change = -change
+        rows.append((name, base["value"], metric["value"], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_report(report):
+    for name, metric in report["metrics"].items():
+        spread = f" ± {metric['stdev']:.3g}" if "stdev" in metric else ""
+        print(f"  {name:<34} {metric['value']:>14,.3f}{spread} {metric['unit']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Currency converter benchmark and regression check")
+    parser.add_argument("--repeat", type=int, default=7, help="timing repeats per measurement")
+    parser.add_argument("--number", type=int, default=2_000,
+                        help="calls per repeat for the single-conversion timings")
+    parser.add_argument("--quick", action="store_true", help="smaller batch sizes and currency counts")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative regression before failing (default 0.2 = 20%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    print("▶ Running currency converter benchmarks...")
+    report = run(args)
+    print_report(report)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(report, baseline, args.threshold)
+    print(f"\nComparison against {args.compare} (threshold {args.threshold:.0%}):")
+    for name, base, value, change in rows:
+        flag = "❌" if name in regressions else "✅"
+        verdict = f"{change:.1%} worse" if change > 0 else f"{-change:.1%} better"
+        print(f"  {flag} {name:<34} {base:>14,.3f} → {value:>14,.3f} ({verdict})")
+    if regressions:
+        print(f"❌ {len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
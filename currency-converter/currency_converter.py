@@ -21,28 +21,181 @@ Created for: Python Hacktoberfest 2025
 License: MIT
 """
 
+import atexit
+import csv
 import json
-import requests
 import datetime
 import os
 import time
+from collections import deque
 from typing import Dict, List, Optional, Tuple
-import tkinter as tk
-from tkinter import ttk, messagebox
+import numpy as np
+from rate_history import RateHistory
+from trends import DEFAULT_WINDOWS, TrendTracker, format_trends
 import threading
 
+# tkinter (currency_gui), requests and the thread pool used for fetching are
+# imported where they are first needed, so short-lived batch workers that
+# only convert do not pay for them at import time.
+
+
+FALLBACK_CURRENCIES = ["USD", "EUR", "GBP", "JPY"]
+
+
+class RateTable:
+    """An immutable snapshot of exchange rates with every cross rate precomputed.
+    
+    matrix[index[a], index[b]] is the rate for converting currency a into
+    currency b, so validating a code is a dict lookup and finding a rate is
+    a single array read.
+    """
+    
+    def __init__(self, rates: Dict[str, float], base_currency: str = "USD"):
+        if not rates:
+            # No rates loaded yet: same fallback as before, everything at 1.0
+            rates = {code: 1.0 for code in FALLBACK_CURRENCIES}
+        self.base_currency = base_currency
+        self.currencies = sorted(set(rates) | {base_currency})
+        self.index = {code: i for i, code in enumerate(self.currencies)}
+        # Units of each currency per 1 unit of the base currency
+        per_base = np.array([1.0 if code == base_currency else float(rates[code])
+                             for code in self.currencies])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.matrix = per_base[np.newaxis, :] / per_base[:, np.newaxis]
+        self.matrix.flags.writeable = False
+    
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """Cross rate from one currency to another (codes must be upper-case)."""
+        return float(self.matrix[self.index[from_currency], self.index[to_currency]])
+    
+    def lookup_indices(self, codes):
+        """Matrix indices for a currency code or an array/column of codes.
+        
+        Each distinct code is resolved once, so the per-row cost is an
+        array gather rather than a dict lookup.
+        """
+        if isinstance(codes, str):
+            index = self.index.get(codes.upper())
+            if index is None:
+                raise ValueError(f"Currency '{codes}' not supported")
+            return index
+        codes = np.asarray(codes)
+        uniques, inverse = np.unique(codes.astype(str, copy=False), return_inverse=True)
+        mapped = np.empty(len(uniques), dtype=np.intp)
+        unknown = []
+        for k, code in enumerate(uniques):
+            index = self.index.get(code.upper())
+            if index is None:
+                unknown.append(code)
+            else:
+                mapped[k] = index
+        if unknown:
+            raise ValueError(f"Currencies not supported: {', '.join(unknown)}")
+        return mapped[inverse].reshape(codes.shape)
+    
+    def convert_many(self, amounts, from_codes, to_codes) -> np.ndarray:
+        """Convert many amounts at once; codes may be single strings or arrays."""
+        amounts = np.asarray(amounts, dtype=float)
+        rates = self.matrix[self.lookup_indices(from_codes), self.lookup_indices(to_codes)]
+        return amounts * rates
+
+
+def __getattr__(name):
+    # Keeps `from currency_converter import CurrencyConverterGUI` working
+    # now that the GUI lives in its own module.
+    if name == "CurrencyConverterGUI":
+        from currency_gui import CurrencyConverterGUI
+        return CurrencyConverterGUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CircuitBreaker:
+    """Stops calling a rate source that keeps failing.
+    
+    After `failure_threshold` consecutive failures the breaker opens and the
+    source is skipped for `reset_timeout` seconds. After that, one trial
+    request is let through (half-open). If it succeeds the breaker closes;
+    if it fails the breaker opens for another `reset_timeout`.
+    """
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+    
+    def allow(self) -> bool:
+        """Whether a request to this source may be made now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_in_flight or self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self._trial_in_flight = True
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
 
 class CurrencyConverter:
     """A comprehensive currency converter with multiple data sources."""
     
-    def __init__(self):
+    def __init__(self, history_enabled: bool = True):
         self.cache_file = "currency_cache.json"
-        self.history_file = "conversion_history.json"
+        self.history_file = "conversion_history.jsonl"
         self.base_currency = "USD"
-        self.last_update = None
-        self.exchange_rates = {}
         self.currency_names = {}
-        self.conversion_history = []
+        
+        # The cache and history files are read on first use, not here, so
+        # creating a converter costs no I/O (and paths can be changed first).
+        self._cache_loaded = False
+        self._exchange_rates = {}
+        self._last_update = None
+        self._rate_table = None
+        self._conversion_history = None
+        
+        # Conversion history: an in-memory ring buffer of the last
+        # `history_size` conversions. New entries are appended to the JSONL
+        # history file in batches by a background thread; the file is
+        # rewritten down to the ring buffer once it holds
+        # `history_size * history_compact_factor` lines.
+        self.history_enabled = history_enabled
+        self.history_size = 100
+        self.history_flush_interval = 1.0  # seconds
+        self.history_batch_size = 50
+        self.history_compact_factor = 5
+        self._pending_history = []
+        self._history_lock = threading.Lock()  # guards the buffers, never held for I/O
+        self._history_io_lock = threading.Lock()
+        self._history_rewrite = False
+        self._history_wakeup = threading.Event()
+        self._history_stop = threading.Event()
+        self._history_writer = None
+        self._history_file_lines = 0
         
         # Free API endpoints (no key required)
         self.api_endpoints = [
@@ -50,9 +203,22 @@ class CurrencyConverter:
             "https://api.fixer.io/latest?base=USD",  # Backup
         ]
         
-        # Load cached data
-        self.load_cache()
-        self.load_history()
+        # All endpoints are queried concurrently over one pooled session and
+        # the first valid answer wins. Only the source that produced the
+        # current rates gets conditional headers, so an unchanged answer
+        # costs a 304 with no body. Sources that keep failing are skipped
+        # by a per-source circuit breaker.
+        self.request_timeout = 10  # seconds, per source
+        self.rates_source = None
+        self.source_validators = {}  # url -> {"etag": ..., "last_modified": ...}
+        self.breakers = {}  # url -> CircuitBreaker
+        self._session = None
+        self._session_lock = threading.Lock()
+        
+        # Every fetched snapshot is also appended to a columnar rate history
+        # in a `rate_history` directory next to the cache file.
+        self._rate_history = None
+        self._trend_trackers = {}  # (from, to, windows) -> TrendTracker
         
         # Popular currency pairs for quick access
         self.popular_pairs = [
@@ -76,26 +242,203 @@ class CurrencyConverter:
             "IDR": "Indonesian Rupiah", "VND": "Vietnamese Dong", "EGP": "Egyptian Pound"
         }
 
+    def _ensure_cache_loaded(self):
+        if not self._cache_loaded:
+            self._cache_loaded = True
+            self.load_cache()
+    
+    @property
+    def exchange_rates(self) -> Dict[str, float]:
+        """Rates per 1 unit of the base currency."""
+        self._ensure_cache_loaded()
+        return self._exchange_rates
+    
+    @exchange_rates.setter
+    def exchange_rates(self, rates: Dict[str, float]):
+        # Every load/refresh goes through here; the cross-rate matrix is
+        # rebuilt on first use after the rates change. Rates set explicitly
+        # take the place of the cache file.
+        self._cache_loaded = True
+        self._exchange_rates = rates
+        self._rate_table = None
+    
+    @property
+    def last_update(self) -> Optional[str]:
+        """ISO timestamp of the current rates, or None if there are none."""
+        self._ensure_cache_loaded()
+        return self._last_update
+    
+    @last_update.setter
+    def last_update(self, value: Optional[str]):
+        self._cache_loaded = True
+        self._last_update = value
+    
+    @property
+    def conversion_history(self) -> deque:
+        """Ring buffer of recent conversions, read from the history file on first use."""
+        if self._conversion_history is None:
+            self.load_history()
+        return self._conversion_history
+    
+    @conversion_history.setter
+    def conversion_history(self, history: deque):
+        self._conversion_history = history
+    
+    @property
+    def rate_table(self) -> RateTable:
+        """Cross-rate snapshot for the current exchange rates."""
+        table = self._rate_table
+        if table is None:
+            table = self._rate_table = RateTable(self.exchange_rates, self.base_currency)
+        return table
+
+    @property
+    def session(self) -> "requests.Session":
+        """Shared HTTP session, so connections to each source are reused."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    session = requests.Session()
+                    pool_size = max(len(self.api_endpoints), 1)
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                            pool_maxsize=pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+    
+    @property
+    def rate_history(self) -> RateHistory:
+        """Daily rate snapshots, opened on first use."""
+        if self._rate_history is None:
+            directory = os.path.join(os.path.dirname(self.cache_file), "rate_history")
+            self._rate_history = RateHistory(directory, self.base_currency)
+        return self._rate_history
+    
+    def record_rate_history(self):
+        """Append the current rates as today's snapshot."""
+        try:
+            self.rate_history.append(self.exchange_rates)
+        except Exception as e:
+            print(f"Warning: Could not update rate history: {e}")
+            return
+        today = datetime.date.today()
+        for (from_currency, to_currency, _), tracker in self._trend_trackers.items():
+            try:
+                rate = self.rate_history.rate_on(today, from_currency, to_currency)
+            except ValueError:
+                continue
+            if rate is not None:
+                tracker.update(today, rate)
+    
+    def get_trends(self, from_currency: str, to_currency: str,
+                   windows: Tuple[int, ...] = DEFAULT_WINDOWS) -> Dict[int, Dict]:
+        """Mean, volatility, min/max and change of a pair over the last N days.
+        
+        The first call for a pair replays its stored history; afterwards the
+        statistics are updated incrementally with each new snapshot.
+        """
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        key = (from_currency, to_currency, tuple(windows))
+        tracker = self._trend_trackers.get(key)
+        if tracker is None:
+            tracker = TrendTracker(windows)
+            try:
+                dates, rates = self.rate_history.series(from_currency, to_currency)
+            except ValueError:
+                dates, rates = [], []
+            recent = slice(-max(windows) - 1, None)
+            for day, rate in zip(dates[recent], rates[recent]):
+                if not np.isnan(rate):
+                    tracker.update(day, rate)
+            self._trend_trackers[key] = tracker
+        return tracker.stats()
+    
+    def breaker_for(self, api_url: str) -> CircuitBreaker:
+        breaker = self.breakers.get(api_url)
+        if breaker is None:
+            breaker = self.breakers.setdefault(api_url, CircuitBreaker())
+        return breaker
+    
+    def _fetch_source(self, api_url: str) -> Optional[Dict]:
+        """Query one source. Returns None for a 304, otherwise the rates and validators."""
+        headers = {}
+        validators = self.source_validators.get(api_url, {})
+        if api_url == self.rates_source and self.exchange_rates:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        
+        response = self.session.get(api_url, timeout=self.request_timeout, headers=headers)
+        if response.status_code == 304:
+            if not headers:
+                raise ValueError("304 Not Modified for an unconditional request")
+            return None
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data.get('rates'), dict) or not data['rates']:
+            raise ValueError("response has no rates")
+        return {
+            "rates": data['rates'],
+            "validators": {"etag": response.headers.get("ETag"),
+                           "last_modified": response.headers.get("Last-Modified")},
+        }
+    
+    def _fetch_with_breaker(self, api_url: str) -> Optional[Dict]:
+        breaker = self.breaker_for(api_url)
+        try:
+            result = self._fetch_source(api_url)
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+    
     def fetch_exchange_rates(self) -> bool:
-        """Fetch real-time exchange rates from API."""
+        """Fetch real-time exchange rates, racing all API sources."""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from concurrent.futures import TimeoutError as FuturesTimeout
+        
         print("🔄 Fetching latest exchange rates...")
+        self._ensure_cache_loaded()
         
-        for api_url in self.api_endpoints:
-            try:
-                response = requests.get(api_url, timeout=10)
-                response.raise_for_status()
-                data = response.json()
+        sources = [url for url in self.api_endpoints if self.breaker_for(url).allow()]
+        if not sources:
+            print("❌ All API sources are temporarily disabled. Using cached rates.")
+            return False
+        
+        executor = ThreadPoolExecutor(max_workers=len(sources))
+        futures = {executor.submit(self._fetch_with_breaker, url): url for url in sources}
+        try:
+            # Slower sources keep running in the background after a winner is
+            # found; their outcome only updates their circuit breaker.
+            for future in as_completed(futures, timeout=self.request_timeout + 1):
+                api_url = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠️ Failed to fetch from {api_url}: {e}")
+                    continue
                 
-                if 'rates' in data:
-                    self.exchange_rates = data['rates']
-                    self.last_update = datetime.datetime.now().isoformat()
+                self.last_update = datetime.datetime.now().isoformat()
+                if result is None:
                     self.save_cache()
-                    print("✅ Exchange rates updated successfully!")
+                    self.record_rate_history()
+                    print("✅ Exchange rates are up to date (not modified).")
                     return True
-                    
-            except requests.RequestException as e:
-                print(f"⚠️ Failed to fetch from {api_url}: {e}")
-                continue
+                self.exchange_rates = result["rates"]
+                self.rates_source = api_url
+                self.source_validators = {api_url: result["validators"]}
+                self.save_cache()
+                self.record_rate_history()
+                print("✅ Exchange rates updated successfully!")
+                return True
+        except FuturesTimeout:
+            print("⚠️ Timed out waiting for API sources.")
+        finally:
+            executor.shutdown(wait=False)
                 
         print("❌ All API sources failed. Using cached rates.")
         return False
@@ -105,7 +448,9 @@ class CurrencyConverter:
         cache_data = {
             "rates": self.exchange_rates,
             "last_update": self.last_update,
-            "base_currency": self.base_currency
+            "base_currency": self.base_currency,
+            "source": self.rates_source,
+            "validators": self.source_validators,
         }
         try:
             with open(self.cache_file, 'w') as f:
@@ -121,27 +466,140 @@ class CurrencyConverter:
                     cache_data = json.load(f)
                     self.exchange_rates = cache_data.get("rates", {})
                     self.last_update = cache_data.get("last_update")
-                    print(f"📁 Loaded cached rates from {self.last_update}")
+                    self.rates_source = cache_data.get("source")
+                    self.source_validators = cache_data.get("validators") or {}
         except Exception as e:
             print(f"Warning: Could not load cache: {e}")
 
+    def record_history(self, conversion_info: Dict):
+        """Add a conversion to the ring buffer and queue it for writing."""
+        history = self.conversion_history
+        with self._history_lock:
+            history.append(conversion_info)
+            self._pending_history.append(conversion_info)
+            pending = len(self._pending_history)
+        if self._history_writer is None:
+            self._start_history_writer()
+        if pending >= self.history_batch_size:
+            self._history_wakeup.set()
+
+    def _start_history_writer(self):
+        with self._history_lock:
+            if self._history_writer is not None:
+                return
+            self._history_stop.clear()
+            self._history_writer = threading.Thread(target=self._history_writer_loop,
+                                                    daemon=True)
+            self._history_writer.start()
+        atexit.register(self.save_history)
+
+    def _history_writer_loop(self):
+        while not self._history_stop.is_set():
+            self._history_wakeup.wait(self.history_flush_interval)
+            self._history_wakeup.clear()
+            self.save_history()
+
+    def close(self):
+        """Stop the history writer and write any queued entries.
+
+        Recording more history afterwards starts a new writer.
+        """
+        with self._history_lock:
+            writer, self._history_writer = self._history_writer, None
+        if writer is not None:
+            self._history_stop.set()
+            self._history_wakeup.set()
+            writer.join()
+            atexit.unregister(self.save_history)
+        self.save_history()
+
     def save_history(self):
-        """Save conversion history."""
-        try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.conversion_history, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Could not save history: {e}")
+        """Write queued history entries to the history file."""
+        with self._history_io_lock:
+            with self._history_lock:
+                pending, self._pending_history = self._pending_history, []
+                if not pending:
+                    return
+                rewrite = (self._history_rewrite or self._history_file_lines + len(pending)
+                           > self.history_size * self.history_compact_factor)
+                if rewrite:
+                    entries = list(self._conversion_history)
+            try:
+                if rewrite:
+                    # Truncate: rewrite the file with just the ring buffer.
+                    self._write_history_file(entries)
+                    self._history_rewrite = False
+                else:
+                    with open(self.history_file, 'a+b') as f:
+                        # Never glue the first record onto a torn last line.
+                        if f.tell():
+                            f.seek(-1, os.SEEK_END)
+                            if f.read(1) != b"\n":
+                                f.write(b"\n")
+                        f.writelines((json.dumps(entry) + "\n").encode() for entry in pending)
+                    self._history_file_lines += len(pending)
+            except Exception as e:
+                print(f"Warning: Could not save history: {e}")
+
+    def _write_history_file(self, entries: List[Dict]):
+        """Atomically replace the history file with ``entries`` as JSONL."""
+        tmp_file = self.history_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        os.replace(tmp_file, self.history_file)
+        self._history_file_lines = len(entries)
 
     def load_history(self):
-        """Load conversion history."""
+        """Load conversion history (JSONL, or the older single JSON list)."""
+        if self._conversion_history is None:
+            self._conversion_history = deque(maxlen=self.history_size)
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    self.conversion_history = json.load(f)
+            # Older versions kept history as a JSON list in "<name>.json";
+            # it is copied to "<name>.jsonl" the first time it is found.
+            legacy_file = self.history_file[:-1] if self.history_file.endswith(".jsonl") else None
+            if (legacy_file and not os.path.exists(self.history_file)
+                    and os.path.exists(legacy_file)):
+                with open(legacy_file) as f:
+                    entries = list(json.load(f))[-self.history_size:]
+                with self._history_io_lock:
+                    self._write_history_file(entries)
+                with self._history_lock:
+                    self._conversion_history = deque(entries, maxlen=self.history_size)
+            elif os.path.exists(self.history_file):
+                with open(self.history_file, 'rb') as f:
+                    content = f.read()
+                # Files from older versions hold one JSON list; they are
+                # rewritten as JSONL on the next save.
+                self._history_rewrite = content.lstrip().startswith(b'[')
+                if self._history_rewrite:
+                    entries = json.loads(content)
+                else:
+                    entries = self._read_history_lines(content)
+                with self._history_lock:
+                    self._conversion_history = deque(entries, maxlen=self.history_size)
+                self._history_file_lines = len(entries)
         except Exception as e:
             print(f"Warning: Could not load history: {e}")
 
+    def _read_history_lines(self, content: bytes) -> List[Dict]:
+        """Parse JSONL history, dropping a torn or corrupt tail from the file."""
+        entries = []
+        good_end = 0
+        for line in content.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+            good_end += len(line)
+        if good_end < len(content):
+            # Left by a crash mid-append; the next append would be glued onto it.
+            with open(self.history_file, 'r+b') as f:
+                f.truncate(good_end)
+        return entries
+
     def is_cache_stale(self, max_age_hours: int = 1) -> bool:
         """Check if cached data is too old."""
         if not self.last_update:
@@ -153,14 +611,26 @@ class CurrencyConverter:
 
     def get_available_currencies(self) -> List[str]:
         """Get list of available currencies."""
-        if not self.exchange_rates:
-            return ["USD", "EUR", "GBP", "JPY"]  # Fallback
-        return sorted(list(self.exchange_rates.keys()) + [self.base_currency])
+        return list(self.rate_table.currencies)
+
+    def get_rate(self, from_currency: str, to_currency: str) -> float:
+        """Get the exchange rate between two currencies."""
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        table = self.rate_table
+        for currency in (from_currency, to_currency):
+            if currency not in table.index:
+                raise ValueError(f"Currency '{currency}' not supported")
+        return table.rate(from_currency, to_currency)
 
-    def convert_currency(self, amount: float, from_currency: str, to_currency: str) -> Tuple[float, Dict]:
+    def convert_currency(self, amount: float, from_currency: str, to_currency: str,
+                         record_history: bool = True) -> Tuple[float, Dict]:
         """
         Convert amount from one currency to another.
         
+        Pass record_history=False (or create the converter with
+        history_enabled=False) to skip history on hot paths.
+        
         Returns:
             Tuple of (converted_amount, conversion_info)
         """
@@ -168,10 +638,10 @@ class CurrencyConverter:
         to_currency = to_currency.upper()
         
         # Validate currencies
-        available_currencies = self.get_available_currencies()
-        if from_currency not in available_currencies:
+        table = self.rate_table
+        if from_currency not in table.index:
             raise ValueError(f"Currency '{from_currency}' not supported")
-        if to_currency not in available_currencies:
+        if to_currency not in table.index:
             raise ValueError(f"Currency '{to_currency}' not supported")
         
         # Handle same currency conversion
@@ -187,16 +657,8 @@ class CurrencyConverter:
             }
             return amount, conversion_info
         
-        # Get exchange rates
-        if from_currency == self.base_currency:
-            rate = self.exchange_rates.get(to_currency, 1.0)
-        elif to_currency == self.base_currency:
-            rate = 1.0 / self.exchange_rates.get(from_currency, 1.0)
-        else:
-            # Convert through base currency (USD)
-            from_rate = self.exchange_rates.get(from_currency, 1.0)
-            to_rate = self.exchange_rates.get(to_currency, 1.0)
-            rate = to_rate / from_rate
+        # Cross rate through the base currency (USD), precomputed
+        rate = table.rate(from_currency, to_currency)
         
         converted_amount = amount * rate
         
@@ -210,14 +672,25 @@ class CurrencyConverter:
             "data_freshness": self.last_update
         }
         
-        # Add to history
-        self.conversion_history.append(conversion_info)
-        if len(self.conversion_history) > 100:  # Keep last 100 conversions
-            self.conversion_history = self.conversion_history[-100:]
-        self.save_history()
+        # Add to history (written to disk in the background)
+        if record_history and self.history_enabled:
+            self.record_history(conversion_info)
         
         return converted_amount, conversion_info
 
+    def convert_many(self, amounts, from_codes, to_codes) -> Tuple[np.ndarray, Optional[str]]:
+        """
+        Vectorized conversion for batches (e.g. invoice lines).
+        
+        amounts, from_codes and to_codes may be NumPy arrays, pandas columns
+        or lists; either code argument may also be a single currency code.
+        Nothing is recorded in history.
+        
+        Returns:
+            Tuple of (converted_amounts array, data_freshness shared by all rows)
+        """
+        return self.rate_table.convert_many(amounts, from_codes, to_codes), self.last_update
+
     def get_currency_name(self, currency_code: str) -> str:
         """Get full name of currency."""
         return self.currency_names.get(currency_code.upper(), currency_code.upper())
@@ -242,164 +715,6 @@ class CurrencyConverter:
             return f"{symbol}{amount:,.2f}"
 
 
-class CurrencyConverterGUI:
-    """GUI interface for the currency converter."""
-    
-    def __init__(self):
-        self.converter = CurrencyConverter()
-        self.root = tk.Tk()
-        self.setup_gui()
-        
-        # Auto-update rates in background
-        self.auto_update_rates()
-
-    def setup_gui(self):
-        """Setup the GUI interface."""
-        self.root.title("💱 Real-Time Currency Converter")
-        self.root.geometry("600x500")
-        self.root.resizable(True, True)
-        
-        # Configure style
-        style = ttk.Style()
-        style.theme_use('clam')
-        
-        # Main frame
-        main_frame = ttk.Frame(self.root, padding="20")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Title
-        title_label = ttk.Label(main_frame, text="💱 Currency Converter", 
-                               font=("Arial", 16, "bold"))
-        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
-        
-        # Amount input
-        ttk.Label(main_frame, text="Amount:").grid(row=1, column=0, sticky=tk.W, pady=5)
-        self.amount_var = tk.StringVar(value="100")
-        self.amount_entry = ttk.Entry(main_frame, textvariable=self.amount_var, width=20)
-        self.amount_entry.grid(row=1, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
-        
-        # From currency
-        ttk.Label(main_frame, text="From:").grid(row=2, column=0, sticky=tk.W, pady=5)
-        self.from_currency = tk.StringVar(value="USD")
-        self.from_combo = ttk.Combobox(main_frame, textvariable=self.from_currency, 
-                                      values=self.converter.get_available_currencies(), 
-                                      width=15)
-        self.from_combo.grid(row=2, column=1, sticky=(tk.W, tk.E), pady=5, padx=(0, 5))
-        
-        # To currency
-        ttk.Label(main_frame, text="To:").grid(row=2, column=2, sticky=tk.W, pady=5)
-        self.to_currency = tk.StringVar(value="EUR")
-        self.to_combo = ttk.Combobox(main_frame, textvariable=self.to_currency, 
-                                    values=self.converter.get_available_currencies(), 
-                                    width=15)
-        self.to_combo.grid(row=2, column=2, sticky=(tk.W, tk.E), pady=5, padx=(5, 0))
-        
-        # Convert button
-        self.convert_btn = ttk.Button(main_frame, text="🔄 Convert", 
-                                     command=self.convert_currency)
-        self.convert_btn.grid(row=3, column=0, columnspan=3, pady=20)
-        
-        # Result display
-        self.result_var = tk.StringVar(value="Enter amount and click Convert")
-        self.result_label = ttk.Label(main_frame, textvariable=self.result_var, 
-                                     font=("Arial", 12, "bold"), foreground="blue")
-        self.result_label.grid(row=4, column=0, columnspan=3, pady=10)
-        
-        # Rate info
-        self.rate_var = tk.StringVar()
-        self.rate_label = ttk.Label(main_frame, textvariable=self.rate_var, 
-                                   font=("Arial", 10), foreground="gray")
-        self.rate_label.grid(row=5, column=0, columnspan=3, pady=5)
-        
-        # Popular pairs frame
-        pairs_frame = ttk.LabelFrame(main_frame, text="Popular Currency Pairs", padding="10")
-        pairs_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(20, 10))
-        
-        # Create buttons for popular pairs
-        for i, (from_curr, to_curr) in enumerate(self.converter.get_popular_pairs()[:6]):
-            btn = ttk.Button(pairs_frame, text=f"{from_curr} → {to_curr}", 
-                           command=lambda f=from_curr, t=to_curr: self.set_currencies(f, t))
-            btn.grid(row=i//3, column=i%3, padx=5, pady=2, sticky=(tk.W, tk.E))
-        
-        # Status bar
-        self.status_var = tk.StringVar(value="Ready")
-        status_bar = ttk.Label(main_frame, textvariable=self.status_var, 
-                              relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
-        
-        # Configure grid weights
-        main_frame.columnconfigure(1, weight=1)
-        main_frame.columnconfigure(2, weight=1)
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
-        
-        # Bind Enter key to convert
-        self.root.bind('<Return>', lambda e: self.convert_currency())
-
-    def set_currencies(self, from_curr: str, to_curr: str):
-        """Set currency pair from popular pairs."""
-        self.from_currency.set(from_curr)
-        self.to_currency.set(to_curr)
-        self.convert_currency()
-
-    def auto_update_rates(self):
-        """Update exchange rates in background if cache is stale."""
-        if self.converter.is_cache_stale():
-            threading.Thread(target=self.update_rates_background, daemon=True).start()
-
-    def update_rates_background(self):
-        """Update rates in background thread."""
-        self.converter.fetch_exchange_rates()
-        # Update currency lists
-        self.root.after(0, self.update_currency_lists)
-
-    def update_currency_lists(self):
-        """Update currency dropdown lists."""
-        currencies = self.converter.get_available_currencies()
-        self.from_combo['values'] = currencies
-        self.to_combo['values'] = currencies
-
-    def convert_currency(self):
-        """Perform currency conversion."""
-        try:
-            amount = float(self.amount_var.get())
-            from_curr = self.from_currency.get().upper()
-            to_curr = self.to_currency.get().upper()
-            
-            if amount <= 0:
-                raise ValueError("Amount must be positive")
-            
-            self.status_var.set("Converting...")
-            self.root.update()
-            
-            converted_amount, info = self.converter.convert_currency(amount, from_curr, to_curr)
-            
-            # Display result
-            from_formatted = self.converter.format_amount(amount, from_curr)
-            to_formatted = self.converter.format_amount(converted_amount, to_curr)
-            
-            self.result_var.set(f"{from_formatted} = {to_formatted}")
-            
-            # Display rate info
-            rate_text = f"1 {from_curr} = {info['rate']:.4f} {to_curr}"
-            if info['data_freshness'] != "Same currency":
-                rate_text += f" | Updated: {info['data_freshness'][:16]}"
-            self.rate_var.set(rate_text)
-            
-            self.status_var.set("Conversion complete")
-            
-        except ValueError as e:
-            messagebox.showerror("Input Error", str(e))
-            self.status_var.set("Error: Invalid input")
-        except Exception as e:
-            messagebox.showerror("Conversion Error", f"Failed to convert: {str(e)}")
-            self.status_var.set("Conversion failed")
-
-    def run(self):
-        """Start the GUI application."""
-        self.root.mainloop()
-
-
 def main_cli():
     """Command-line interface for the currency converter."""
     converter = CurrencyConverter()
@@ -424,11 +739,12 @@ def main_cli():
         print("3. List all currencies")
         print("4. View conversion history")
         print("5. Update exchange rates")
-        print("6. Start GUI mode")
-        print("7. Exit")
+        print("6. View rate trends")
+        print("7. Start GUI mode")
+        print("8. Exit")
         
         try:
-            choice = input("\nSelect option (1-7): ").strip()
+            choice = input("\nSelect option (1-8): ").strip()
             
             if choice == "1":
                 # Currency conversion
@@ -453,8 +769,8 @@ def main_cli():
                 pairs = converter.get_popular_pairs()
                 for i, (from_curr, to_curr) in enumerate(pairs, 1):
                     try:
-                        _, info = converter.convert_currency(1, from_curr, to_curr)
-                        print(f"{i:2d}. 1 {from_curr} = {info['rate']:.4f} {to_curr}")
+                        rate = converter.get_rate(from_curr, to_curr)
+                        print(f"{i:2d}. 1 {from_curr} = {rate:.4f} {to_curr}")
                     except:
                         print(f"{i:2d}. {from_curr} → {to_curr}: Rate unavailable")
                 
@@ -471,7 +787,7 @@ def main_cli():
             elif choice == "4":
                 # Conversion history
                 print("\n📜 Recent Conversions")
-                history = converter.conversion_history[-10:]  # Last 10
+                history = list(converter.conversion_history)[-10:]  # Last 10
                 if not history:
                     print("No conversion history available.")
                 else:
@@ -491,13 +807,21 @@ def main_cli():
                     print("❌ Failed to update rates. Using cached data.")
                 
             elif choice == "6":
+                # Rate trends
+                print("\n📈 Rate Trends")
+                from_curr = input("From currency (e.g., USD): ").strip().upper()
+                to_curr = input("To currency (e.g., EUR): ").strip().upper()
+                print(format_trends(converter.get_trends(from_curr, to_curr), from_curr, to_curr))
+                
+            elif choice == "7":
                 # Start GUI
                 print("\n🖥️ Starting GUI mode...")
+                from currency_gui import CurrencyConverterGUI
                 gui = CurrencyConverterGUI()
                 gui.run()
                 break
                 
-            elif choice == "7":
+            elif choice == "8":
                 print("👋 Thanks for using Currency Converter!")
                 break
                 
@@ -513,11 +837,184 @@ def main_cli():
             print(f"❌ An error occurred: {e}")
 
 
+def _read_csv_chunks(path: str, chunk_size: int):
+    """Yield (header, list of rows) chunks from a CSV file."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"{path} is empty (no header row)")
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield header, chunk
+                chunk = []
+        if chunk:
+            yield header, chunk
+
+
+def _convert_csv(table: RateTable, input_path: str, output_path: str, amount_col: str,
+                 from_col: Optional[str], from_currency: Optional[str], to_currency: str,
+                 out_col: str, chunk_size: int, decimals: int) -> int:
+    rows_done = 0
+    with open(output_path, 'w', newline='') as out:
+        writer = csv.writer(out)
+        for header, chunk in _read_csv_chunks(input_path, chunk_size):
+            if rows_done == 0:
+                for column in [amount_col] + ([from_col] if from_col else []):
+                    if column not in header:
+                        raise ValueError(f"Column '{column}' not found in {input_path}")
+                writer.writerow(header + [out_col])
+            amount_idx = header.index(amount_col)
+            from_idx = header.index(from_col) if from_col else -1
+            needed = max(amount_idx, from_idx) + 1
+            if min(map(len, chunk)) < needed:
+                short = [rows_done + k + 1 for k, row in enumerate(chunk) if len(row) < needed]
+                listed = ", ".join(map(str, short[:10])) + (", ..." if len(short) > 10 else "")
+                raise ValueError(f"Rows with fewer than {needed} columns: {listed}")
+            try:
+                amounts = np.array([row[amount_idx] for row in chunk], dtype=float)
+            except ValueError as e:
+                raise ValueError(f"Bad amount in rows {rows_done + 1}-{rows_done + len(chunk)}: {e}")
+            if from_col:
+                sources = np.array([row[from_idx] for row in chunk])
+            else:
+                sources = from_currency
+            converted = table.convert_many(amounts, sources, to_currency)
+            writer.writerows(row + [f"{value:.{decimals}f}"] for row, value in zip(chunk, converted))
+            rows_done += len(chunk)
+        if rows_done == 0:
+            raise ValueError(f"No rows found in {input_path}")
+    return rows_done
+
+
+def _convert_parquet(table: RateTable, input_path: str, output_path: str, amount_col: str,
+                     from_col: Optional[str], from_currency: Optional[str], to_currency: str,
+                     out_col: str, chunk_size: int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet files need pyarrow: pip install pyarrow")
+    
+    source = pq.ParquetFile(input_path)
+    writer = None
+    rows_done = 0
+    try:
+        for batch in source.iter_batches(batch_size=chunk_size):
+            amounts = batch.column(amount_col).to_numpy(zero_copy_only=False)
+            if from_col:
+                sources = batch.column(from_col).to_numpy(zero_copy_only=False)
+            else:
+                sources = from_currency
+            converted = table.convert_many(amounts, sources, to_currency)
+            batch = pa.RecordBatch.from_arrays(batch.columns + [pa.array(converted)],
+                                               names=batch.schema.names + [out_col])
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, batch.schema)
+            writer.write_batch(batch)
+            rows_done += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if rows_done == 0:
+        raise ValueError(f"No rows found in {input_path}")
+    return rows_done
+
+
+def convert_file(converter: CurrencyConverter, input_path: str, output_path: str,
+                 amount_col: str, to_currency: str, from_col: Optional[str] = None,
+                 from_currency: Optional[str] = None, out_col: Optional[str] = None,
+                 chunk_size: int = 100_000, decimals: int = 6) -> int:
+    """
+    Convert an amount column of a CSV or Parquet file, streaming in chunks.
+    
+    Every chunk is converted with the same rate snapshot, taken once at the
+    start, so the whole file is priced consistently. Memory use depends on
+    chunk_size, not on file size.
+    
+    Returns:
+        Number of rows written
+    """
+    if (from_col is None) == (from_currency is None):
+        raise ValueError("Give exactly one of from_col or from_currency")
+    table = converter.rate_table  # one snapshot for the whole file
+    to_currency = to_currency.upper()
+    table.lookup_indices(to_currency)  # fail fast on an unknown target
+    out_col = out_col or f"amount_{to_currency}"
+    
+    formats = {os.path.splitext(path)[1].lower() for path in (input_path, output_path)}
+    if formats == {".parquet"}:
+        convert = _convert_parquet
+        options = ()
+    elif formats <= {".csv", ".txt"}:
+        convert = _convert_csv
+        options = (decimals,)
+    else:
+        raise ValueError("Input and output must both be CSV or both be Parquet files")
+    
+    # Write next to the output and rename on success, so a failure part way
+    # through never leaves a truncated file at output_path.
+    tmp_path = output_path + ".tmp"
+    try:
+        rows = convert(table, input_path, tmp_path, amount_col, from_col, from_currency,
+                       to_currency, out_col, chunk_size, *options)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def main_convert_file(argv: List[str]) -> int:
+    """`convert-file` subcommand: bulk-convert a CSV/Parquet ledger."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        prog="currency_converter.py convert-file",
+        description="Convert an amount column of a CSV or Parquet file in streaming chunks.")
+    parser.add_argument("input", help="input .csv or .parquet file")
+    parser.add_argument("--amount-col", required=True, help="column holding the amounts")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-col", help="column holding each row's currency code")
+    source.add_argument("--from", dest="from_currency", help="currency of every row")
+    parser.add_argument("--to", required=True, help="target currency")
+    parser.add_argument("--out", required=True, help="output file (same format as input)")
+    parser.add_argument("--out-col", help="name of the added column (default: amount_<TO>)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per chunk")
+    parser.add_argument("--decimals", type=int, default=6, help="decimal places in CSV output")
+    args = parser.parse_args(argv)
+    
+    converter = CurrencyConverter(history_enabled=False)
+    if converter.is_cache_stale():
+        converter.fetch_exchange_rates()
+    
+    start = time.time()
+    try:
+        rows = convert_file(converter, args.input, args.out, args.amount_col, args.to,
+                            from_col=args.from_col, from_currency=args.from_currency,
+                            out_col=args.out_col, chunk_size=args.chunk_size,
+                            decimals=args.decimals)
+    except (ValueError, KeyError, OSError) as e:
+        print(f"❌ Error: {e}")
+        return 1
+    print(f"✅ Converted {rows:,} rows in {time.time() - start:.2f}s → {args.out}")
+    print(f"Rates as of: {converter.last_update}")
+    return 0
+
+
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--gui":
+    if len(sys.argv) > 1 and sys.argv[1] == "convert-file":
+        sys.exit(main_convert_file(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        import rate_server
+        sys.exit(rate_server.main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--gui":
         # Start in GUI mode
+        from currency_gui import CurrencyConverterGUI
         gui = CurrencyConverterGUI()
         gui.run()
     else:
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tkinter GUI for the currency converter.
+
+Kept apart from currency_converter.py so that importing the converter
+does not load tkinter. ``currency_converter.CurrencyConverterGUI`` still
+works and imports this module on first use.
+"""
+
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from currency_converter import CurrencyConverter
+from trends import format_trends
+
+
+class CurrencyConverterGUI:
+    """GUI interface for the currency converter."""
+    
+    def __init__(self):
+        self.converter = CurrencyConverter()
+        self.root = tk.Tk()
+        self.setup_gui()
+        
+        # Auto-update rates in background
+        self.auto_update_rates()
+
+    def setup_gui(self):
+        """Setup the GUI interface."""
+        self.root.title("💱 Real-Time Currency Converter")
+        self.root.geometry("600x500")
+        self.root.resizable(True, True)
+        
+        # Configure style
+        style = ttk.Style()
+        style.theme_use('clam')
+        
+        # Main frame
+        main_frame = ttk.Frame(self.root, padding="20")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Title
+        title_label = ttk.Label(main_frame, text="💱 Currency Converter", 
+                               font=("Arial", 16, "bold"))
+        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
+        
+        # Amount input
+        ttk.Label(main_frame, text="Amount:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.amount_var = tk.StringVar(value="100")
+        self.amount_entry = ttk.Entry(main_frame, textvariable=self.amount_var, width=20)
+        self.amount_entry.grid(row=1, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        
+        # From currency
+        ttk.Label(main_frame, text="From:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.from_currency = tk.StringVar(value="USD")
+        self.from_combo = ttk.Combobox(main_frame, textvariable=self.from_currency, 
+                                      values=self.converter.get_available_currencies(), 
+                                      width=15)
+        self.from_combo.grid(row=2, column=1, sticky=(tk.W, tk.E), pady=5, padx=(0, 5))
+        
+        # To currency
+        ttk.Label(main_frame, text="To:").grid(row=2, column=2, sticky=tk.W, pady=5)
+        self.to_currency = tk.StringVar(value="EUR")
+        self.to_combo = ttk.Combobox(main_frame, textvariable=self.to_currency, 
+                                    values=self.converter.get_available_currencies(), 
+                                    width=15)
+        self.to_combo.grid(row=2, column=2, sticky=(tk.W, tk.E), pady=5, padx=(5, 0))
+        
+        # Convert button
+        self.convert_btn = ttk.Button(main_frame, text="🔄 Convert", 
+                                     command=self.convert_currency)
+        self.convert_btn.grid(row=3, column=0, columnspan=2, pady=20)
+        
+        # Trends button
+        self.trends_btn = ttk.Button(main_frame, text="📈 Trends", 
+                                    command=self.show_trends)
+        self.trends_btn.grid(row=3, column=2, pady=20)
+        
+        # Result display
+        self.result_var = tk.StringVar(value="Enter amount and click Convert")
+        self.result_label = ttk.Label(main_frame, textvariable=self.result_var, 
+                                     font=("Arial", 12, "bold"), foreground="blue")
+        self.result_label.grid(row=4, column=0, columnspan=3, pady=10)
+        
+        # Rate info
+        self.rate_var = tk.StringVar()
+        self.rate_label = ttk.Label(main_frame, textvariable=self.rate_var, 
+                                   font=("Arial", 10), foreground="gray")
+        self.rate_label.grid(row=5, column=0, columnspan=3, pady=5)
+        
+        # Popular pairs frame
+        pairs_frame = ttk.LabelFrame(main_frame, text="Popular Currency Pairs", padding="10")
+        pairs_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(20, 10))
+        
+        # Create buttons for popular pairs
+        for i, (from_curr, to_curr) in enumerate(self.converter.get_popular_pairs()[:6]):
+            btn = ttk.Button(pairs_frame, text=f"{from_curr} → {to_curr}", 
+                           command=lambda f=from_curr, t=to_curr: self.set_currencies(f, t))
+            btn.grid(row=i//3, column=i%3, padx=5, pady=2, sticky=(tk.W, tk.E))
+        
+        # Status bar
+        self.status_var = tk.StringVar(value="Ready")
+        status_bar = ttk.Label(main_frame, textvariable=self.status_var, 
+                              relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        # Configure grid weights
+        main_frame.columnconfigure(1, weight=1)
+        main_frame.columnconfigure(2, weight=1)
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        
+        # Bind Enter key to convert
+        self.root.bind('<Return>', lambda e: self.convert_currency())
+
+    def set_currencies(self, from_curr: str, to_curr: str):
+        """Set currency pair from popular pairs."""
+        self.from_currency.set(from_curr)
+        self.to_currency.set(to_curr)
+        self.convert_currency()
+
+    def auto_update_rates(self):
+        """Update exchange rates in background if cache is stale."""
+        if self.converter.is_cache_stale():
+            threading.Thread(target=self.update_rates_background, daemon=True).start()
+
+    def update_rates_background(self):
+        """Update rates in background thread."""
+        self.converter.fetch_exchange_rates()
+        # Update currency lists
+        self.root.after(0, self.update_currency_lists)
+
+    def update_currency_lists(self):
+        """Update currency dropdown lists."""
+        currencies = self.converter.get_available_currencies()
+        self.from_combo['values'] = currencies
+        self.to_combo['values'] = currencies
+
+    def convert_currency(self):
+        """Perform currency conversion."""
+        try:
+            amount = float(self.amount_var.get())
+            from_curr = self.from_currency.get().upper()
+            to_curr = self.to_currency.get().upper()
+            
+            if amount <= 0:
+                raise ValueError("Amount must be positive")
+            
+            self.status_var.set("Converting...")
+            self.root.update()
+            
+            converted_amount, info = self.converter.convert_currency(amount, from_curr, to_curr)
+            
+            # Display result
+            from_formatted = self.converter.format_amount(amount, from_curr)
+            to_formatted = self.converter.format_amount(converted_amount, to_curr)
+            
+            self.result_var.set(f"{from_formatted} = {to_formatted}")
+            
+            # Display rate info
+            rate_text = f"1 {from_curr} = {info['rate']:.4f} {to_curr}"
+            if info['data_freshness'] != "Same currency":
+                rate_text += f" | Updated: {info['data_freshness'][:16]}"
+            self.rate_var.set(rate_text)
+            
+            self.status_var.set("Conversion complete")
+            
+        except ValueError as e:
+            messagebox.showerror("Input Error", str(e))
+            self.status_var.set("Error: Invalid input")
+        except Exception as e:
+            messagebox.showerror("Conversion Error", f"Failed to convert: {str(e)}")
+            self.status_var.set("Conversion failed")
+
+    def show_trends(self):
+        """Show 30/90/365-day statistics for the selected pair."""
+        from_curr = self.from_currency.get().upper()
+        to_curr = self.to_currency.get().upper()
+        trends = self.converter.get_trends(from_curr, to_curr)
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"📈 {from_curr}/{to_curr} Trends")
+        ttk.Label(window, text=format_trends(trends, from_curr, to_curr),
+                  font=("Courier", 10), padding="10").pack()
+        ttk.Button(window, text="Close", command=window.destroy).pack(pady=(0, 10))
+
+    def run(self):
+        """Start the GUI application."""
+        self.root.mainloop()
+
+
+if __name__ == "__main__":
+    CurrencyConverterGUI().run()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Columnar on-disk store of exchange-rate snapshots.
+
+One row per day, one float32 column per currency, every value in units of
+the currency per 1 unit of the base currency::
+
+    rate_history/
+        meta.json       base currency, column order and the rates file name
+        dates.i32       int32 days since 1970-01-01, ascending
+        rates.N.f32     float32 matrix, len(dates) x N currencies
+
+Both data files are append-only and memory-mapped for reading, so opening
+years of history only maps two files, and "rates on day D" or "EUR/JPY
+between two dates" is a binary search on the date index plus a slice.
+
+A day's rates row is written before its date, so a crash mid-append
+leaves at most an orphaned row that readers ignore and the next append
+overwrites. A snapshot that brings a new currency writes a wider matrix to
+a new file and then swaps ``meta.json`` to point at it (earlier days get
+NaN for the new column); this is rare and never disturbs open readers.
+"""
+
+import datetime
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DATE_DTYPE = np.dtype("<i4")
+RATE_DTYPE = np.dtype("<f4")
+
+
+def to_day(date) -> int:
+    """Days since the epoch for a date, datetime, ISO string or datetime64."""
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    elif isinstance(date, str):
+        date = date[:10]
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+class RateHistory:
+    """Append-only, memory-mapped history of daily rate snapshots."""
+
+    def __init__(self, directory: str, base_currency: str = "USD"):
+        self.directory = directory
+        self.base_currency = base_currency
+        self.meta_file = os.path.join(directory, "meta.json")
+        self.dates_file = os.path.join(directory, "dates.i32")
+        self.currencies: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.rates_file = None
+        self._dates = np.empty(0, DATE_DTYPE)
+        self._rates = np.empty((0, 0), RATE_DTYPE)
+        self._stamp = None
+        self._refresh()
+
+    def _refresh(self):
+        """Map the files, again only if they changed since the last call."""
+        try:
+            meta_stat = os.stat(self.meta_file)
+            dates_size = os.stat(self.dates_file).st_size
+        except FileNotFoundError:
+            return
+        stamp = (meta_stat.st_mtime_ns, meta_stat.st_size, dates_size)
+        if stamp == self._stamp:
+            return
+
+        with open(self.meta_file) as f:
+            meta = json.load(f)
+        self.base_currency = meta["base_currency"]
+        self.currencies = meta["currencies"]
+        self.index = {code: k for k, code in enumerate(self.currencies)}
+        self.rates_file = os.path.join(self.directory, meta["rates_file"])
+
+        row_bytes = RATE_DTYPE.itemsize * len(self.currencies)
+        rows = min(dates_size // DATE_DTYPE.itemsize,
+                   os.path.getsize(self.rates_file) // row_bytes)
+        if rows:
+            self._dates = np.memmap(self.dates_file, DATE_DTYPE, "r", shape=(rows,))
+            self._rates = np.memmap(self.rates_file, RATE_DTYPE, "r",
+                                    shape=(rows, len(self.currencies)))
+        else:
+            self._dates = np.empty(0, DATE_DTYPE)
+            self._rates = np.empty((0, len(self.currencies)), RATE_DTYPE)
+        self._stamp = stamp
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._dates)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Dates of the stored snapshots as datetime64[D]."""
+        self._refresh()
+        return self._dates.astype("datetime64[D]")
+
+    def _columns(self, from_currency: str, to_currency: str) -> Tuple[int, int]:
+        columns = []
+        for code in (from_currency, to_currency):
+            column = self.index.get(code.upper())
+            if column is None:
+                raise ValueError(f"Currency '{code}' has no rate history")
+            columns.append(column)
+        return columns[0], columns[1]
+
+    def _row_on(self, date) -> Optional[int]:
+        """Row of the latest snapshot on or before ``date``."""
+        row = int(np.searchsorted(self._dates, to_day(date), side="right")) - 1
+        return row if row >= 0 else None
+
+    def rates_on(self, date) -> Optional[Dict[str, float]]:
+        """All base-currency rates in effect on ``date``, or None before the first snapshot."""
+        self._refresh()
+        row = self._row_on(date)
+        if row is None:
+            return None
+        values = self._rates[row]
+        return {code: float(values[k]) for k, code in enumerate(self.currencies)
+                if not np.isnan(values[k])}
+
+    def rate_on(self, date, from_currency: str, to_currency: str) -> Optional[float]:
+        """Cross rate in effect on ``date``, or None if it was not recorded then."""
+        self._refresh()
+        from_col, to_col = self._columns(from_currency, to_currency)
+        row = self._row_on(date)
+        if row is None:
+            return None
+        rate = float(self._rates[row, to_col]) / float(self._rates[row, from_col])
+        return None if np.isnan(rate) else rate
+
+    def series(self, from_currency: str, to_currency: str,
+               start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Dates and cross rates of every snapshot from ``start`` to ``end`` inclusive.
+
+        Returns ``(dates, rates)`` as datetime64[D] and float64 arrays; days
+        on which either currency was not recorded are NaN.
+        """
+        self._refresh()
+        from_col, to_col = self._columns(from_currency, to_currency)
+        lo = 0 if start is None else int(np.searchsorted(self._dates, to_day(start), side="left"))
+        hi = (len(self._dates) if end is None
+              else int(np.searchsorted(self._dates, to_day(end), side="right")))
+        block = self._rates[lo:hi]
+        rates = block[:, to_col].astype(np.float64) / block[:, from_col]
+        return self._dates[lo:hi].astype("datetime64[D]"), rates
+
+    def append(self, rates: Dict[str, float], date=None):
+        """Record one snapshot; a second snapshot on the same day replaces the first."""
+        self.append_many([(datetime.date.today() if date is None else date, rates)])
+
+    def append_many(self, snapshots: Iterable[Tuple[object, Dict[str, float]]]):
+        """Record ``(date, rates)`` snapshots, which must be in date order."""
+        self._refresh()
+        stored = len(self._dates)
+        last_stored = int(self._dates[-1]) if stored else None
+        days, snapshot_rates = [], []
+        for date, rates in snapshots:
+            day = to_day(date)
+            last = days[-1] if days else last_stored
+            if last is not None and day < last:
+                raise ValueError("Rate snapshots must be appended in date order")
+            rates = {code.upper(): float(value) for code, value in rates.items()}
+            rates.setdefault(self.base_currency, 1.0)
+            if days and day == days[-1]:
+                snapshot_rates[-1] = rates
+            else:
+                days.append(day)
+                snapshot_rates.append(rates)
+        if not days:
+            return
+
+        new_codes = set().union(*snapshot_rates).difference(self.index)
+        if new_codes:
+            self._add_columns(new_codes)
+        matrix = np.full((len(days), len(self.currencies)), np.nan, RATE_DTYPE)
+        for row, rates in enumerate(snapshot_rates):
+            columns = [self.index[code] for code in rates]
+            matrix[row, columns] = list(rates.values())
+
+        # Drop our own mappings before touching the files.
+        self._dates = np.empty(0, DATE_DTYPE)
+        self._rates = np.empty((0, len(self.currencies)), RATE_DTYPE)
+        self._stamp = None
+
+        replace_last = last_stored is not None and days[0] == last_stored
+        row_bytes = matrix.shape[1] * RATE_DTYPE.itemsize
+        with open(self.rates_file, "r+b") as f:
+            f.truncate(stored * row_bytes)  # discard an orphaned row, if any
+            if replace_last:
+                f.seek((stored - 1) * row_bytes)
+                f.write(matrix[0].tobytes())
+                matrix = matrix[1:]
+            f.seek(0, os.SEEK_END)
+            f.write(matrix.tobytes())
+        with open(self.dates_file, "r+b") as f:
+            f.truncate(stored * DATE_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.asarray(days[1:] if replace_last else days, DATE_DTYPE).tobytes())
+        self._refresh()
+
+    def _add_columns(self, new_codes):
+        """Rewrite the matrix with extra columns and switch meta.json to it."""
+        os.makedirs(self.directory, exist_ok=True)
+        currencies = sorted(set(self.currencies) | set(new_codes))
+        index = {code: k for k, code in enumerate(currencies)}
+        widened = np.full((len(self._dates), len(currencies)), np.nan, RATE_DTYPE)
+        if self.currencies:
+            widened[:, [index[code] for code in self.currencies]] = self._rates
+
+        rates_name = f"rates.{len(currencies)}.f32"
+        rates_file = os.path.join(self.directory, rates_name)
+        with open(rates_file, "wb") as f:
+            f.write(widened.tobytes())
+        if not os.path.exists(self.dates_file):
+            open(self.dates_file, "wb").close()
+
+        meta = {"base_currency": self.base_currency, "currencies": currencies,
+                "rates_file": rates_name}
+        temp_meta = self.meta_file + ".tmp"
+        with open(temp_meta, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_meta, self.meta_file)  # the switch-over point
+
+        old_rates_file = self.rates_file
+        self._stamp = None
+        self._refresh()
+        if old_rates_file and old_rates_file != self.rates_file:
+            os.remove(old_rates_file)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Rate-serving HTTP microservice.
+
+One process keeps a refreshed rate snapshot in memory and serves it to any
+number of clients, so they stop loading their own caches and calling the
+upstream APIs independently::
+
+    python currency_converter.py serve --port 8000
+
+Endpoints:
+
+- ``GET /rates``: ``{"base": "USD", "rates": {...}, "last_update": ...}``. This is
+  the same shape as the upstream APIs, so another ``CurrencyConverter`` can
+  use the service by setting ``api_endpoints = ["http://host:8000/rates"]``.
+- ``GET /convert?amount=100&from=USD&to=EUR``: one conversion as JSON.
+
+Every response carries an ETag derived from the snapshot. A client that
+sends it back in ``If-None-Match`` gets ``304 Not Modified`` until the
+rates change. A background thread checks ``is_cache_stale()`` every
+``check_interval`` seconds and refetches when the rates are older than
+``max_age_hours``. Requests never wait on it: each request reads whichever
+snapshot is current, and a refresh swaps in a new one.
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from currency_converter import CurrencyConverter, RateTable
+
+
+class RateSnapshot:
+    """Immutable rates plus the pre-rendered /rates body and its ETag."""
+
+    def __init__(self, rates: Dict[str, float], last_update: Optional[str],
+                 base_currency: str, table: RateTable):
+        self.rates = dict(rates)
+        self.last_update = last_update
+        self.base_currency = base_currency
+        self.table = table
+        self.body = json.dumps({"base": base_currency, "rates": self.rates,
+                                "last_update": last_update}).encode()
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()[:16]
+
+    @classmethod
+    def from_converter(cls, converter: CurrencyConverter) -> "RateSnapshot":
+        return cls(converter.exchange_rates, converter.last_update,
+                   converter.base_currency, converter.rate_table)
+
+
+class RateRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CurrencyRateServer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        snapshot = self.server.rate_server.snapshot
+        url = urlsplit(self.path)
+        if url.path not in ("/rates", "/convert"):
+            self._send_json(404, {"error": "Not found"})
+            return
+        if not snapshot.rates:
+            self._send_json(503, {"error": "No exchange rates available yet"})
+            return
+
+        if url.path == "/rates":
+            self._send(200, snapshot.body, snapshot.etag)
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            amount = float(query.get("amount", "1"))
+            from_currency = query["from"].upper()
+            to_currency = query["to"].upper()
+        except KeyError as e:
+            self._send_json(400, {"error": f"Missing parameter: {e.args[0]}"})
+            return
+        except ValueError:
+            self._send_json(400, {"error": "Invalid amount"})
+            return
+        for currency in (from_currency, to_currency):
+            if currency not in snapshot.table.index:
+                self._send_json(400, {"error": f"Currency '{currency}' not supported"})
+                return
+
+        # One snapshot's answers never change, so the ETag only has to tell
+        # snapshots and queries apart.
+        etag = '"%s"' % hashlib.sha1(
+            f"{snapshot.etag}|{amount!r}|{from_currency}|{to_currency}".encode()).hexdigest()[:16]
+        rate = snapshot.table.rate(from_currency, to_currency)
+        self._send_json(200, {
+            "from_currency": from_currency,
+            "to_currency": to_currency,
+            "rate": rate,
+            "amount": amount,
+            "converted_amount": amount * rate,
+            "data_freshness": snapshot.last_update,
+        }, etag)
+
+    def _send_json(self, status: int, payload: Dict, etag: Optional[str] = None):
+        self._send(status, json.dumps(payload).encode(), etag)
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None):
+        if etag is not None and etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.rate_server.verbose:
+            super().log_message(format, *args)
+
+
+class RateServer:
+    """Owns the converter, the current snapshot and the refresh thread."""
+
+    def __init__(self, converter: Optional[CurrencyConverter] = None, host: str = "127.0.0.1",
+                 port: int = 8000, max_age_hours: float = 1, check_interval: float = 60.0,
+                 verbose: bool = False):
+        self.converter = converter or CurrencyConverter(history_enabled=False)
+        self.max_age_hours = max_age_hours
+        self.check_interval = check_interval
+        self.verbose = verbose
+        self.snapshot = RateSnapshot.from_converter(self.converter)
+        self.httpd = ThreadingHTTPServer((host, port), RateRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.rate_server = self
+        self._stop = threading.Event()
+        self._refresher = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def refresh(self) -> bool:
+        """Refetch if the rates are stale; returns True if a new snapshot was published."""
+        if self.converter.is_cache_stale(self.max_age_hours):
+            self.converter.fetch_exchange_rates()
+        if (self.converter.last_update == self.snapshot.last_update
+                and self.converter.exchange_rates == self.snapshot.rates):
+            return False
+        self.snapshot = RateSnapshot.from_converter(self.converter)
+        return True
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Warning: Could not refresh rates: {e}")
+            self._stop.wait(self.check_interval)
+
+    def _start_refresher(self):
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def start(self):
+        """Start serving and refreshing in background threads."""
+        self._start_refresher()
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def serve_forever(self):
+        """Serve in the calling thread until shutdown() or an interrupt."""
+        self._start_refresher()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self._stop.set()
+
+    def shutdown(self):
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._refresher is not None:
+            self._refresher.join()
+
+
+def main(argv=None) -> int:
+    """`serve` subcommand: run the rate service until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="currency_converter.py serve",
+        description="Serve one shared, periodically refreshed rate snapshot over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument("--max-age-hours", type=float, default=1,
+                        help="refetch rates once they are older than this")
+    parser.add_argument("--check-interval", type=float, default=60.0,
+                        help="seconds between staleness checks")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = RateServer(host=args.host, port=args.port, max_age_hours=args.max_age_hours,
+                        check_interval=args.check_interval, verbose=args.verbose)
+    print(f"💱 Serving exchange rates on {server.url} (/rates, /convert)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Rate server stopped")
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
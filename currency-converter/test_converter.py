@@ -8,15 +8,23 @@ import unittest
 import os
 import json
 import tempfile
+import datetime
 from unittest.mock import patch, MagicMock
 import sys
 import threading
 import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from collections import deque
+import numpy as np
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from currency_converter import CurrencyConverter
+from currency_converter import CircuitBreaker, CurrencyConverter, convert_file
+from rate_history import RateHistory
+from trends import TrendTracker, rolling_stats
+from rate_server import RateServer
+import benchmark
 
 
 class TestCurrencyConverter(unittest.TestCase):
@@ -48,6 +56,7 @@ class TestCurrencyConverter(unittest.TestCase):
     def tearDown(self):
         """Clean up test files."""
         import shutil
+        self.converter.close()
         if os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
     
@@ -172,6 +181,117 @@ class TestCurrencyConverter(unittest.TestCase):
         
         self.assertEqual(len(new_converter.conversion_history), 2)
     
+    def test_history_is_buffered_and_appended(self):
+        """Test that history is written in batches to an append-only file."""
+        self.converter.history_flush_interval = 60
+        self.converter.convert_currency(100, "USD", "EUR")
+        self.assertFalse(os.path.exists(self.history_file))
+        
+        self.converter.save_history()
+        self.converter.convert_currency(5, "USD", "GBP")
+        self.converter.save_history()
+        with open(self.history_file) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])["to_currency"], "GBP")
+    
+    def test_history_file_is_truncated(self):
+        """Test that the history file is compacted to the ring buffer."""
+        self.converter.history_flush_interval = 60
+        self.converter.history_size = 10
+        self.converter.conversion_history = deque(maxlen=10)
+        self.converter.history_compact_factor = 2
+        for i in range(25):
+            self.converter.convert_currency(i, "USD", "EUR")
+            self.converter.save_history()
+        with open(self.history_file) as f:
+            self.assertLessEqual(len(f.readlines()), 20)
+        
+        new_converter = CurrencyConverter()
+        new_converter.history_file = self.history_file
+        new_converter.load_history()
+        self.assertEqual(new_converter.conversion_history[-1]["amount"], 24)
+    
+    def test_history_can_be_disabled(self):
+        """Test that hot-path callers can skip history."""
+        self.converter.convert_currency(100, "USD", "EUR", record_history=False)
+        self.assertEqual(len(self.converter.conversion_history), 0)
+        
+        quiet = CurrencyConverter(history_enabled=False)
+        quiet.exchange_rates = self.test_rates
+        quiet.convert_currency(100, "USD", "EUR")
+        self.assertEqual(len(quiet.conversion_history), 0)
+    
+    def test_torn_history_line_is_dropped(self):
+        """Test that a partial last line from a crash does not lose the history."""
+        with open(self.history_file, 'w') as f:
+            f.write('{"amount": 1}\n{"amount": 2}\n{"amou')
+        self.converter.load_history()
+        self.assertEqual([e["amount"] for e in self.converter.conversion_history], [1, 2])
+        
+        self.converter.convert_currency(3, "USD", "EUR")
+        self.converter.save_history()
+        new_converter = CurrencyConverter()
+        new_converter.history_file = self.history_file
+        new_converter.load_history()
+        self.assertEqual([e["amount"] for e in new_converter.conversion_history], [1, 2, 3])
+    
+    def test_history_append_starts_on_new_line(self):
+        """Test that appends never continue a line left unterminated after loading."""
+        self.converter.load_history()
+        with open(self.history_file, 'w') as f:
+            f.write('{"amount": 1}')
+        self.converter.convert_currency(2, "USD", "EUR")
+        self.converter.save_history()
+        with open(self.history_file) as f:
+            amounts = [json.loads(line)["amount"] for line in f]
+        self.assertEqual(amounts, [1, 2])
+    
+    def test_close_stops_history_writer(self):
+        """Test that close() flushes pending history and stops the writer thread."""
+        self.converter.history_flush_interval = 60
+        self.converter.convert_currency(100, "USD", "EUR")
+        writer = self.converter._history_writer
+        self.assertTrue(writer.is_alive())
+        
+        self.converter.close()
+        self.assertFalse(writer.is_alive())
+        with open(self.history_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+    
+    def test_legacy_json_history_is_loaded(self):
+        """Test that a single-list history file at the JSONL path still loads."""
+        with open(self.history_file, 'w') as f:
+            json.dump([{"amount": 1}, {"amount": 2}], f)
+        self.converter.load_history()
+        self.assertEqual(len(self.converter.conversion_history), 2)
+        
+        self.converter.convert_currency(3, "USD", "EUR")
+        self.converter.save_history()
+        with open(self.history_file) as f:
+            self.assertEqual(len(f.readlines()), 3)
+    
+    def test_legacy_history_file_is_migrated(self):
+        """Test that conversion_history.json from older versions is migrated on upgrade."""
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        try:
+            with open("conversion_history.json", 'w') as f:
+                json.dump([{"amount": 1}, {"amount": 2}], f)
+            converter = CurrencyConverter()
+            converter.exchange_rates = self.test_rates
+            self.assertEqual([e["amount"] for e in converter.conversion_history], [1, 2])
+            with open("conversion_history.jsonl") as f:
+                self.assertEqual([json.loads(line)["amount"] for line in f], [1, 2])
+            
+            converter.convert_currency(3, "USD", "EUR")
+            converter.close()
+            converter = CurrencyConverter()
+            self.assertEqual([e["amount"] for e in converter.conversion_history], [1, 2, 3])
+            converter.close()
+        finally:
+            os.chdir(cwd)
+    
     def test_cache_staleness_check(self):
         """Test cache staleness detection."""
         import datetime
@@ -200,11 +320,56 @@ class TestCurrencyConverter(unittest.TestCase):
         # Should be sorted
         self.assertEqual(currencies, sorted(currencies))
     
-    @patch('requests.get')
+    def test_cross_rate_matrix(self):
+        """Test the precomputed cross-rate matrix."""
+        table = self.converter.rate_table
+        self.assertEqual(table.currencies, self.converter.get_available_currencies())
+        usd, eur, gbp = (table.index[c] for c in ("USD", "EUR", "GBP"))
+        self.assertEqual(table.matrix[usd, eur], self.test_rates["EUR"])
+        self.assertAlmostEqual(table.matrix[eur, gbp], self.test_rates["GBP"] / self.test_rates["EUR"])
+        self.assertEqual(table.matrix[gbp, gbp], 1.0)
+    
+    def test_rate_table_rebuilt_when_rates_change(self):
+        """Test that assigning new rates refreshes the matrix."""
+        self.assertNotIn("CHF", self.converter.get_available_currencies())
+        self.converter.exchange_rates = {"EUR": 0.9, "CHF": 0.8}
+        self.assertIn("CHF", self.converter.get_available_currencies())
+        self.assertAlmostEqual(self.converter.get_rate("eur", "chf"), 0.8 / 0.9)
+        with self.assertRaises(ValueError):
+            self.converter.get_rate("USD", "GBP")
+    
+    def test_convert_many(self):
+        """Test vectorized batch conversion."""
+        amounts = np.array([100.0, 50.0, 10.0, 7.0])
+        from_codes = np.array(["USD", "eur", "GBP", "JPY"])
+        to_codes = ["EUR", "USD", "JPY", "JPY"]
+        results, freshness = self.converter.convert_many(amounts, from_codes, to_codes)
+        
+        for amount, from_curr, to_curr, result in zip(amounts, from_codes, to_codes, results):
+            expected, _ = self.converter.convert_currency(amount, from_curr, to_curr,
+                                                          record_history=False)
+            self.assertAlmostEqual(result, expected, places=9)
+        self.assertEqual(freshness, "2025-10-02T12:00:00")
+        self.assertEqual(len(self.converter.conversion_history), 0)
+    
+    def test_convert_many_single_target(self):
+        """Test batch conversion to one currency given as a string."""
+        results, _ = self.converter.convert_many([1, 2, 3], ["EUR"] * 3, "USD")
+        np.testing.assert_allclose(results, np.array([1, 2, 3]) / self.test_rates["EUR"])
+    
+    def test_convert_many_invalid_currency(self):
+        """Test that unknown codes in a batch are reported."""
+        with self.assertRaises(ValueError) as ctx:
+            self.converter.convert_many([1, 2], ["USD", "XXX"], "EUR")
+        self.assertIn("XXX", str(ctx.exception))
+    
+    @patch('requests.Session.get')
     def test_fetch_exchange_rates_success(self, mock_get):
         """Test successful API rate fetching."""
         # Mock successful API response
         mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.json.return_value = {
             "rates": {"EUR": 0.85, "GBP": 0.73}
         }
@@ -217,7 +382,7 @@ class TestCurrencyConverter(unittest.TestCase):
         self.assertEqual(self.converter.exchange_rates["EUR"], 0.85)
         self.assertEqual(self.converter.exchange_rates["GBP"], 0.73)
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_fetch_exchange_rates_failure(self, mock_get):
         """Test API failure handling."""
         # Mock API failure
@@ -273,13 +438,669 @@ class TestCurrencyConverter(unittest.TestCase):
         self.assertIsInstance(info["timestamp"], str)
 
 
+class StubRateHandler(BaseHTTPRequestHandler):
+    """Stub rate API: /fast answers at once, /slow after a delay, /broken with a 500."""
+    
+    rates = {"EUR": 0.9, "GBP": 0.8}
+    etag = '"rates-v1"'
+    
+    def do_GET(self):
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        self.server.request_headers.setdefault(self.path, []).append(dict(self.headers))
+        if self.path == "/broken":
+            self.send_response(500)
+            self.end_headers()
+            return
+        if self.path == "/slow":
+            time.sleep(1.5)
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        rates = dict(self.rates, SRC=2.0 if self.path == "/slow" else 1.0)
+        body = json.dumps({"base": "USD", "rates": rates}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRateSources(unittest.TestCase):
+    """Test concurrent fetching against a local stub HTTP server."""
+    
+    @classmethod
+    def setUpClass(cls):
+        from socketserver import ThreadingMixIn
+        
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+        
+        cls.server = Server(("127.0.0.1", 0), StubRateHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+    
+    def setUp(self):
+        self.server.hits = {}
+        self.server.request_headers = {}
+        self.temp_dir = tempfile.mkdtemp()
+        self.converter = CurrencyConverter(history_enabled=False)
+        self.converter.cache_file = os.path.join(self.temp_dir, "cache.json")
+        self.converter.exchange_rates = {}
+        self.converter.rates_source = None
+        self.converter.source_validators = {}
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_fastest_source_wins(self):
+        """A slow primary does not delay the refresh."""
+        self.converter.api_endpoints = [self.base_url + "/slow", self.base_url + "/fast"]
+        start = time.perf_counter()
+        self.assertTrue(self.converter.fetch_exchange_rates())
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(self.converter.exchange_rates["SRC"], 1.0)
+        self.assertEqual(self.converter.rates_source, self.base_url + "/fast")
+    
+    def test_dead_source_is_skipped(self):
+        """A failing source does not prevent an update."""
+        self.converter.api_endpoints = [self.base_url + "/broken", self.base_url + "/fast"]
+        self.assertTrue(self.converter.fetch_exchange_rates())
+        self.assertEqual(self.converter.exchange_rates["EUR"], 0.9)
+    
+    def test_conditional_get_not_modified(self):
+        """Unchanged rates come back as a 304 and only refresh the timestamp."""
+        url = self.base_url + "/fast"
+        self.converter.api_endpoints = [url]
+        self.assertTrue(self.converter.fetch_exchange_rates())
+        self.assertNotIn("If-None-Match", self.server.request_headers["/fast"][0])
+        first_update = self.converter.last_update
+        
+        time.sleep(0.01)
+        self.converter.exchange_rates = dict(self.converter.exchange_rates, MARKER=1.0)
+        self.assertTrue(self.converter.fetch_exchange_rates())
+        headers = self.server.request_headers["/fast"][1]
+        self.assertEqual(headers["If-None-Match"], StubRateHandler.etag)
+        self.assertIn("MARKER", self.converter.exchange_rates)  # rates kept as they were
+        self.assertNotEqual(self.converter.last_update, first_update)
+    
+    def test_validators_persist_in_cache(self):
+        """ETags survive a restart so the first refresh can be conditional."""
+        self.converter.api_endpoints = [self.base_url + "/fast"]
+        self.converter.fetch_exchange_rates()
+        
+        restarted = CurrencyConverter(history_enabled=False)
+        restarted.cache_file = self.converter.cache_file
+        restarted.load_cache()
+        restarted.api_endpoints = self.converter.api_endpoints
+        self.assertEqual(restarted.rates_source, self.base_url + "/fast")
+        self.assertTrue(restarted.fetch_exchange_rates())
+        self.assertEqual(self.server.request_headers["/fast"][1]["If-None-Match"],
+                         StubRateHandler.etag)
+    
+    def test_circuit_breaker_stops_calling_dead_source(self):
+        """A source that keeps failing is skipped until its cooldown ends."""
+        self.converter.api_endpoints = [self.base_url + "/broken", self.base_url + "/fast"]
+        for _ in range(6):
+            self.converter.fetch_exchange_rates()
+            time.sleep(0.05)  # let the losing request finish
+        self.assertEqual(self.server.hits["/broken"], 3)
+        self.assertEqual(self.converter.breakers[self.base_url + "/broken"].state, "open")
+    
+    def test_all_sources_open(self):
+        """With every breaker open the cached rates are kept."""
+        self.converter.api_endpoints = [self.base_url + "/broken"]
+        for _ in range(3):
+            self.assertFalse(self.converter.fetch_exchange_rates())
+        self.assertFalse(self.converter.fetch_exchange_rates())
+        self.assertEqual(self.server.hits["/broken"], 3)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test the per-source circuit breaker state machine."""
+    
+    def test_open_half_open_closed(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        
+        now[0] = 10.0
+        self.assertEqual(breaker.state, "half-open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # only one trial at a time
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())  # trial failed: open again
+        
+        now[0] = 20.0
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+
+class TestRateHistory(unittest.TestCase):
+    """Test cases for the columnar rate history store."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.temp_dir, "rate_history")
+        self.history = RateHistory(self.directory)
+        self.history.append_many([
+            ("2025-01-01", {"EUR": 0.90, "JPY": 150.0}),
+            ("2025-01-02", {"EUR": 0.92, "JPY": 151.0}),
+            ("2025-01-05", {"EUR": 0.94, "JPY": 149.0}),
+        ])
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_rate_on_date(self):
+        """Test point lookups, including days between snapshots."""
+        self.assertAlmostEqual(self.history.rate_on("2025-01-02", "USD", "EUR"), 0.92, places=6)
+        self.assertAlmostEqual(self.history.rate_on("2025-01-04", "USD", "EUR"), 0.92, places=6)
+        self.assertAlmostEqual(self.history.rate_on("2025-01-05", "eur", "jpy"), 149.0 / 0.94,
+                               places=3)
+        self.assertIsNone(self.history.rate_on("2024-12-31", "USD", "EUR"))
+        self.assertAlmostEqual(self.history.rates_on("2025-01-01")["USD"], 1.0)
+        with self.assertRaises(ValueError):
+            self.history.rate_on("2025-01-02", "USD", "XYZ")
+    
+    def test_series_range(self):
+        """Test slicing a pair's series by date range."""
+        dates, rates = self.history.series("EUR", "JPY", "2025-01-02", "2025-01-05")
+        self.assertEqual([str(d) for d in dates], ["2025-01-02", "2025-01-05"])
+        np.testing.assert_allclose(rates, [151.0 / 0.92, 149.0 / 0.94], rtol=1e-6)
+        dates, _ = self.history.series("USD", "EUR")
+        self.assertEqual(len(dates), 3)
+    
+    def test_same_day_replaces(self):
+        """Test that a second snapshot on one day overwrites the first."""
+        self.history.append({"EUR": 0.95, "JPY": 148.0}, date="2025-01-05")
+        self.assertEqual(len(self.history), 3)
+        self.assertAlmostEqual(self.history.rate_on("2025-01-05", "USD", "EUR"), 0.95, places=6)
+        with self.assertRaises(ValueError):
+            self.history.append({"EUR": 0.9}, date="2025-01-03")
+    
+    def test_new_currency_adds_column(self):
+        """Test that a new currency widens the matrix without losing history."""
+        self.history.append({"EUR": 0.96, "JPY": 147.0, "GBP": 0.8}, date="2025-01-06")
+        self.assertIn("GBP", self.history.currencies)
+        self.assertIsNone(self.history.rate_on("2025-01-02", "USD", "GBP"))
+        self.assertAlmostEqual(self.history.rate_on("2025-01-06", "USD", "GBP"), 0.8, places=6)
+        self.assertAlmostEqual(self.history.rate_on("2025-01-01", "USD", "EUR"), 0.90, places=6)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["dates.i32", "meta.json", "rates.4.f32"])
+    
+    def test_reopen_and_orphaned_row(self):
+        """Test persistence and recovery from a half-finished append."""
+        with open(self.history.rates_file, "ab") as f:
+            f.write(np.zeros(len(self.history.currencies), dtype=np.float32).tobytes())
+        reopened = RateHistory(self.directory)
+        self.assertEqual(len(reopened), 3)
+        reopened.append({"EUR": 0.97, "JPY": 146.0}, date="2025-01-07")
+        self.assertEqual(len(RateHistory(self.directory)), 4)
+        self.assertAlmostEqual(RateHistory(self.directory).rate_on("2025-01-07", "USD", "EUR"),
+                               0.97, places=6)
+    
+    def test_ten_years_loads_fast(self):
+        """Test that ten years of 170 currencies opens in milliseconds."""
+        directory = os.path.join(self.temp_dir, "big")
+        codes = [f"C{i:03d}" for i in range(170)]
+        start = datetime.date(2015, 1, 1)
+        RateHistory(directory).append_many(
+            (start + datetime.timedelta(days=d), dict.fromkeys(codes, 1.0 + d / 1000))
+            for d in range(3650))
+        
+        began = time.perf_counter()
+        history = RateHistory(directory)
+        _, rates = history.series("C001", "C100", "2020-01-01", "2020-12-31")
+        elapsed = time.perf_counter() - began
+        self.assertEqual(len(rates), 366)
+        self.assertLess(elapsed, 0.1)
+    
+    def test_fetch_appends_snapshot(self):
+        """Test that a successful fetch records the rates in history."""
+        converter = CurrencyConverter(history_enabled=False)
+        converter.cache_file = os.path.join(self.temp_dir, "cache.json")
+        response = MagicMock(status_code=200, headers={})
+        response.json.return_value = {"rates": {"EUR": 0.88, "GBP": 0.77}}
+        with patch('requests.Session.get', return_value=response):
+            self.assertTrue(converter.fetch_exchange_rates())
+        self.assertEqual(converter.rate_history.directory,
+                         os.path.join(self.temp_dir, "rate_history"))
+        self.assertAlmostEqual(converter.rate_history.rate_on(datetime.date.today(), "USD", "GBP"),
+                               0.77, places=6)
+
+
+class TestTrends(unittest.TestCase):
+    """Test cases for rolling and incremental trend statistics."""
+    
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.rates = 0.9 * np.cumprod(1 + rng.normal(0, 0.004, 500))
+        self.days = np.datetime64("2024-01-01") + np.arange(500)
+    
+    def test_rolling_stats_matches_naive(self):
+        """Test the vectorized windows against a plain loop."""
+        stats = rolling_stats(self.rates, 30)
+        self.assertEqual(len(stats["mean"]), 471)
+        for i in (0, 100, 470):
+            window = self.rates[i:i + 30]
+            returns = window[1:] / window[:-1] - 1
+            self.assertAlmostEqual(stats["mean"][i], window.mean())
+            self.assertAlmostEqual(stats["min"][i], window.min())
+            self.assertAlmostEqual(stats["max"][i], window.max())
+            self.assertAlmostEqual(stats["volatility_pct"][i], returns.std(ddof=1) * 100)
+            self.assertAlmostEqual(stats["change_pct"][i], (window[-1] / window[0] - 1) * 100)
+    
+    def test_tracker_matches_rolling_stats(self):
+        """Test that incremental updates agree with recomputing from scratch."""
+        tracker = TrendTracker((30, 90, 365))
+        for day, rate in zip(self.days, self.rates):
+            tracker.update(day, rate)
+        trends = tracker.stats()
+        for size in (30, 90, 365):
+            expected = {name: values[-1] for name, values in rolling_stats(self.rates, size).items()}
+            self.assertEqual(trends[size]["days"], size)
+            for name, value in expected.items():
+                self.assertAlmostEqual(trends[size][name], value, places=9)
+    
+    def test_tracker_same_day_replaces(self):
+        """Test that several refreshes on one day count as one day."""
+        tracker = TrendTracker((30,))
+        tracker.update("2025-01-01", 1.0)
+        tracker.update("2025-01-02", 1.5)
+        tracker.update("2025-01-02", 1.1)
+        tracker.update("2024-12-31", 9.0)  # out of date, ignored
+        stats = tracker.stats()[30]
+        self.assertEqual(stats["days"], 2)
+        self.assertAlmostEqual(stats["max"], 1.1)
+        self.assertAlmostEqual(stats["change_pct"], 10.0)
+        self.assertIsNone(stats["volatility_pct"])
+    
+    def test_converter_trends_follow_new_snapshots(self):
+        """Test get_trends() replays history, then updates incrementally."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            converter = CurrencyConverter(history_enabled=False)
+            converter.cache_file = os.path.join(temp_dir, "cache.json")
+            today = np.datetime64(datetime.date.today(), "D")
+            converter.rate_history.append_many(
+                (today - 40 + i, {"EUR": 0.9 + i / 1000}) for i in range(40))
+            trends = converter.get_trends("usd", "eur")
+            self.assertEqual(trends[30]["days"], 30)
+            self.assertEqual(trends[365]["days"], 40)
+            self.assertAlmostEqual(trends[30]["max"], 0.939, places=5)
+            
+            converter.exchange_rates = {"EUR": 0.95}
+            converter.record_rate_history()
+            trends = converter.get_trends("USD", "EUR")
+            self.assertEqual(trends[365]["days"], 41)
+            self.assertAlmostEqual(trends[30]["max"], 0.95, places=5)
+            self.assertEqual(converter.get_trends("USD", "XYZ"), {})
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir)
+
+
+class TestRateServer(unittest.TestCase):
+    """Test cases for the rate-serving HTTP service."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.converter = CurrencyConverter(history_enabled=False)
+        self.converter.cache_file = os.path.join(self.temp_dir, "server_cache.json")
+        self.converter.exchange_rates = {"EUR": 0.85, "GBP": 0.73, "JPY": 110.0}
+        self.converter.last_update = datetime.datetime.now().isoformat()
+        self.server = RateServer(self.converter, port=0, check_interval=0.05)
+        self.server.start()
+    
+    def tearDown(self):
+        import shutil
+        self.server.shutdown()
+        shutil.rmtree(self.temp_dir)
+    
+    def get(self, path, headers=None):
+        import http.client
+        host, port = self.server.httpd.server_address[:2]
+        connection = http.client.HTTPConnection(host, port, timeout=5)
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response.status, response.getheader("ETag"), json.loads(body) if body else None
+    
+    def test_rates_with_etag(self):
+        """Test /rates and a conditional repeat request."""
+        status, etag, data = self.get("/rates")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["rates"]["EUR"], 0.85)
+        self.assertEqual(data["base"], "USD")
+        status, etag_again, data = self.get("/rates", {"If-None-Match": etag})
+        self.assertEqual(status, 304)
+        self.assertEqual(etag_again, etag)
+        self.assertIsNone(data)
+    
+    def test_convert(self):
+        """Test /convert answers and input errors."""
+        status, etag, data = self.get("/convert?amount=100&from=eur&to=GBP")
+        self.assertEqual(status, 200)
+        self.assertAlmostEqual(data["converted_amount"], 100 * 0.73 / 0.85)
+        self.assertEqual(self.get("/convert?amount=100&from=EUR&to=GBP",
+                                  {"If-None-Match": etag})[0], 304)
+        self.assertNotEqual(self.get("/convert?amount=5&from=EUR&to=GBP")[1], etag)
+        self.assertEqual(self.get("/convert?amount=1&from=EUR&to=XYZ")[0], 400)
+        self.assertEqual(self.get("/convert?amount=abc&from=EUR&to=GBP")[0], 400)
+        self.assertEqual(self.get("/convert?from=EUR")[0], 400)
+        self.assertEqual(self.get("/nope")[0], 404)
+    
+    def test_client_converter_uses_service(self):
+        """Test that a converter can fetch from the service, conditionally."""
+        client = CurrencyConverter(history_enabled=False)
+        client.cache_file = os.path.join(self.temp_dir, "client_cache.json")
+        client.exchange_rates = {}
+        client.api_endpoints = [self.server.url + "/rates"]
+        self.assertTrue(client.fetch_exchange_rates())
+        self.assertEqual(client.exchange_rates["JPY"], 110.0)
+        with patch.object(client, "save_cache") as save_cache:
+            self.assertTrue(client.fetch_exchange_rates())  # answered with a 304
+            save_cache.assert_called_once()
+        self.assertEqual(client.exchange_rates["JPY"], 110.0)
+    
+    def test_background_refresh_publishes_snapshot(self):
+        """Test that stale rates are refetched and served with a new ETag."""
+        _, old_etag, _ = self.get("/rates")
+        
+        def fake_fetch():
+            self.converter.exchange_rates = {"EUR": 0.9, "GBP": 0.75, "JPY": 120.0}
+            self.converter.last_update = datetime.datetime.now().isoformat()
+            return True
+        
+        with patch.object(self.converter, "fetch_exchange_rates", side_effect=fake_fetch):
+            self.converter.last_update = "2000-01-01T00:00:00"
+            deadline = time.time() + 5
+            while self.server.snapshot.rates.get("JPY") != 120.0 and time.time() < deadline:
+                time.sleep(0.02)
+        status, etag, data = self.get("/rates", {"If-None-Match": old_etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(etag, old_etag)
+        self.assertEqual(data["rates"]["JPY"], 120.0)
+    
+    def test_no_rates_yet(self):
+        """Test that an empty converter answers 503 rather than fake rates."""
+        self.server.shutdown()
+        self.converter.exchange_rates = {}
+        self.server = RateServer(self.converter, port=0, check_interval=0.05)
+        self.server.start()
+        self.assertEqual(self.get("/rates")[0], 503)
+        self.assertEqual(self.get("/convert?from=USD&to=EUR")[0], 503)
+
+
+class TestStartup(unittest.TestCase):
+    """Guards against import-time and construction-time regressions."""
+    
+    HEAVY_MODULES = ("tkinter", "requests", "urllib3", "http.client", "ssl",
+                     "concurrent.futures", "argparse")
+    # Import budget in seconds on top of numpy, which conversion needs anyway.
+    IMPORT_BUDGET = float(os.environ.get("CURRENCY_IMPORT_BUDGET", "0.1"))
+    
+    def run_python(self, code):
+        import subprocess
+        temp_dir = tempfile.mkdtemp()
+        try:
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+            result = subprocess.run([sys.executable, "-c", code], cwd=temp_dir, env=env,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    universal_newlines=True, check=True)
+            return result.stdout, os.listdir(temp_dir)
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir)
+    
+    def test_import_and_init_stay_light(self):
+        """Test that no GUI/network modules load and __init__ does no I/O."""
+        stdout, files = self.run_python(
+            "import json, sys, currency_converter\n"
+            "converter = currency_converter.CurrencyConverter()\n"
+            f"print(json.dumps([m for m in {self.HEAVY_MODULES!r} if m in sys.modules]))\n")
+        self.assertEqual(json.loads(stdout), [])  # and nothing else was printed
+        self.assertEqual(files, [])
+    
+    def test_import_time_budget(self):
+        """Test that importing the converter stays fast."""
+        stdout, _ = self.run_python(
+            "import time, numpy\n"
+            "start = time.perf_counter()\n"
+            "import currency_converter\n"
+            "print(time.perf_counter() - start)\n")
+        self.assertLess(float(stdout), self.IMPORT_BUDGET)
+    
+    def test_cache_and_history_load_on_first_use(self):
+        """Test that files are read lazily, from the paths set after construction."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            cache_file = os.path.join(temp_dir, "cache.json")
+            history_file = os.path.join(temp_dir, "history.jsonl")
+            with open(cache_file, "w") as f:
+                json.dump({"rates": {"EUR": 0.5}, "last_update": "2025-01-01T00:00:00"}, f)
+            with open(history_file, "w") as f:
+                f.write(json.dumps({"amount": 7}) + "\n")
+            
+            converter = CurrencyConverter()
+            converter.cache_file = cache_file
+            converter.history_file = history_file
+            self.assertEqual(converter.last_update, "2025-01-01T00:00:00")
+            self.assertEqual(converter.get_rate("USD", "EUR"), 0.5)
+            self.assertEqual(list(converter.conversion_history), [{"amount": 7}])
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir)
+    
+    def test_gui_attribute_is_lazy(self):
+        """Test that the GUI class is still reachable from currency_converter."""
+        try:
+            import tkinter  # noqa: F401
+        except ImportError:
+            self.skipTest("tkinter not available")
+        import currency_converter
+        import currency_gui
+        self.assertIs(currency_converter.CurrencyConverterGUI, currency_gui.CurrencyConverterGUI)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test cases for the benchmark's baseline comparison."""
+    
+    def report(self, **values):
+        return {"metrics": {
+            name: {"value": value, "higher_is_better": name.startswith("batch"), "tracked": True}
+            for name, value in values.items()}}
+    
+    def test_compare_flags_regressions_beyond_threshold(self):
+        """Test direction-aware regression detection."""
+        baseline = self.report(single_conversion=10.0, batch_throughput_1000=1000.0,
+                               cache_load_10=1.0)
+        current = self.report(single_conversion=11.0, batch_throughput_1000=700.0,
+                              cache_load_10=2.0, new_metric=5.0)
+        rows, regressions = benchmark.compare(current, baseline, threshold=0.2)
+        self.assertEqual(regressions, ["batch_throughput_1000", "cache_load_10"])
+        changes = {name: change for name, _, _, change in rows}
+        self.assertAlmostEqual(changes["single_conversion"], 0.1)
+        self.assertAlmostEqual(changes["batch_throughput_1000"], 0.3)
+        self.assertNotIn("new_metric", changes)
+    
+    def test_untracked_metrics_never_fail(self):
+        """Test that reported-only metrics are not compared."""
+        baseline = self.report(history_overhead=1.0)
+        current = self.report(history_overhead=9.0)
+        current["metrics"]["history_overhead"]["tracked"] = False
+        self.assertEqual(benchmark.compare(current, baseline, 0.2), ([], []))
+    
+    def test_main_exit_status(self):
+        """Test a quick run end to end, against a passing and a failing baseline."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            out = os.path.join(temp_dir, "results.json")
+            base = os.path.join(temp_dir, "baseline.json")
+            quick = ["--quick", "--repeat", "2", "--number", "20", "--out", out]
+            self.assertEqual(benchmark.main(quick + ["--save-baseline", base]), 0)
+            self.assertEqual(benchmark.main(quick + ["--compare", base, "--threshold", "100"]), 0)
+            
+            with open(base) as f:
+                baseline = json.load(f)
+            baseline["metrics"]["single_conversion"]["value"] /= 1000  # impossibly fast
+            with open(base, "w") as f:
+                json.dump(baseline, f)
+            self.assertEqual(benchmark.main(quick + ["--compare", base]), 1)
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir)
+
+
+class TestConvertFile(unittest.TestCase):
+    """Test cases for streaming bulk file conversion."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.converter = CurrencyConverter(history_enabled=False)
+        self.converter.exchange_rates = {"EUR": 0.85, "GBP": 0.73, "JPY": 110.0}
+        self.input_file = os.path.join(self.temp_dir, "ledger.csv")
+        with open(self.input_file, 'w') as f:
+            f.write("id,amount,currency\n")
+            for i in range(25):
+                f.write(f"{i},{i * 10},{['USD', 'EUR', 'GBP'][i % 3]}\n")
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def read_csv(self, path):
+        import csv
+        with open(path, newline='') as f:
+            return list(csv.DictReader(f))
+    
+    def test_csv_with_currency_column(self):
+        """Test converting a CSV in several chunks."""
+        out = os.path.join(self.temp_dir, "out.csv")
+        rows = convert_file(self.converter, self.input_file, out, "amount", "jpy",
+                            from_col="currency", chunk_size=7)
+        self.assertEqual(rows, 25)
+        
+        result = self.read_csv(out)
+        self.assertEqual(len(result), 25)
+        for row in result:
+            expected, _ = self.converter.convert_currency(float(row["amount"]), row["currency"],
+                                                          "JPY", record_history=False)
+            self.assertAlmostEqual(float(row["amount_JPY"]), expected, places=4)
+    
+    def test_csv_with_fixed_source_currency(self):
+        """Test converting a CSV whose rows share one currency."""
+        out = os.path.join(self.temp_dir, "out.csv")
+        convert_file(self.converter, self.input_file, out, "amount", "EUR",
+                     from_currency="USD", out_col="eur")
+        result = self.read_csv(out)
+        self.assertAlmostEqual(float(result[3]["eur"]), 30 * 0.85, places=6)
+    
+    def test_missing_column(self):
+        """Test that a missing column is reported."""
+        with self.assertRaises(ValueError):
+            convert_file(self.converter, self.input_file, os.path.join(self.temp_dir, "o.csv"),
+                         "price", "EUR", from_currency="USD")
+    
+    def test_short_rows_are_reported(self):
+        """Test that rows with missing columns give a ValueError with row numbers."""
+        with open(self.input_file, 'a') as f:
+            f.write("25,250,USD\n26\n27,270\n")
+        with self.assertRaises(ValueError) as caught:
+            convert_file(self.converter, self.input_file, os.path.join(self.temp_dir, "o.csv"),
+                         "amount", "EUR", from_col="currency", chunk_size=10)
+        self.assertIn("27, 28", str(caught.exception))
+    
+    def test_failed_conversion_leaves_no_output(self):
+        """Test that a bad row part way through leaves any existing output untouched."""
+        out = os.path.join(self.temp_dir, "out.csv")
+        with open(out, 'w') as f:
+            f.write("previous run\n")
+        with open(self.input_file, 'a') as f:
+            f.write("25,lots,USD\n")
+        with self.assertRaises(ValueError):
+            convert_file(self.converter, self.input_file, out, "amount", "EUR",
+                         from_col="currency", chunk_size=5)
+        with open(out) as f:
+            self.assertEqual(f.read(), "previous run\n")
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ["ledger.csv", "out.csv"])
+    
+    def test_empty_csv_is_reported(self):
+        """Test that an empty CSV gives a ValueError rather than a crash."""
+        open(self.input_file, 'w').close()
+        with self.assertRaisesRegex(ValueError, "no header row"):
+            convert_file(self.converter, self.input_file, os.path.join(self.temp_dir, "o.csv"),
+                         "amount", "EUR", from_col="currency")
+        self.assertEqual(os.listdir(self.temp_dir), ["ledger.csv"])
+    
+    def test_empty_parquet_is_reported(self):
+        """Test that a Parquet file with no rows gives a ValueError."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        source = os.path.join(self.temp_dir, "ledger.parquet")
+        pq.write_table(pa.table({"amount": pa.array([], pa.float64()),
+                                 "currency": pa.array([], pa.string())}), source)
+        with self.assertRaisesRegex(ValueError, "No rows found"):
+            convert_file(self.converter, source, os.path.join(self.temp_dir, "o.parquet"),
+                         "amount", "USD", from_col="currency")
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ["ledger.csv", "ledger.parquet"])
+    
+    def test_parquet(self):
+        """Test converting a Parquet file batch by batch."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        source = os.path.join(self.temp_dir, "ledger.parquet")
+        pq.write_table(pa.table({"amount": [1.0, 2.0, 3.0], "currency": ["EUR", "USD", "GBP"]}),
+                       source)
+        out = os.path.join(self.temp_dir, "out.parquet")
+        rows = convert_file(self.converter, source, out, "amount", "USD",
+                            from_col="currency", chunk_size=2)
+        self.assertEqual(rows, 3)
+        converted = pq.read_table(out).column("amount_USD").to_pylist()
+        self.assertAlmostEqual(converted[0], 1 / 0.85)
+        self.assertAlmostEqual(converted[2], 3 / 0.73)
+
+
 class TestPerformance(unittest.TestCase):
     """Performance tests for the currency converter."""
     
     def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
         self.converter = CurrencyConverter()
+        self.converter.history_file = os.path.join(self.temp_dir, "history.jsonl")
         self.converter.exchange_rates = {"EUR": 0.85, "GBP": 0.73, "JPY": 110.0}
     
+    def tearDown(self):
+        import shutil
+        self.converter.close()
+        shutil.rmtree(self.temp_dir)
+    
     def test_conversion_performance(self):
         """Test that conversions are fast enough."""
         start_time = time.time()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Trend and volatility statistics for a currency pair.
+
+Statistics are taken over the last N daily snapshots of a pair's rate:
+
+- ``mean``: average rate
+- ``volatility_pct``: sample standard deviation of the day-to-day returns, in percent
+- ``min`` / ``max``: lowest and highest rate
+- ``change_pct``: change from the first to the last rate in the window, in percent
+
+``rolling_stats`` computes them for every window position of a stored
+series at once. ``TrendTracker`` keeps them up to date as snapshots arrive:
+running sums for the mean and volatility, and monotonic deques for the
+min/max, so each update and each read is O(1) per window.
+"""
+
+import math
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_WINDOWS = (30, 90, 365)
+
+
+def rolling_stats(rates, window: int) -> Dict[str, np.ndarray]:
+    """Statistics for every full ``window`` of a rate series.
+
+    Entry ``i`` of each returned array covers ``rates[i:i + window]``.
+    """
+    if window < 3:
+        raise ValueError("Trend windows must cover at least 3 days")
+    rates = np.asarray(rates, dtype=np.float64)
+    if len(rates) < window:
+        empty = np.empty(0)
+        return {"mean": empty, "volatility_pct": empty, "min": empty, "max": empty,
+                "change_pct": empty}
+    windows = sliding_window_view(rates, window)
+    returns = rates[1:] / rates[:-1] - 1
+    return_windows = sliding_window_view(returns, window - 1)
+    return {
+        "mean": windows.mean(axis=1),
+        "volatility_pct": return_windows.std(axis=1, ddof=1) * 100,
+        "min": windows.min(axis=1),
+        "max": windows.max(axis=1),
+        "change_pct": (rates[window - 1:] / rates[:len(rates) - window + 1] - 1) * 100,
+    }
+
+
+class _Window:
+    """Committed values of the last ``size - 1`` days, with running aggregates."""
+
+    def __init__(self, size: int):
+        if size < 3:
+            raise ValueError("Trend windows must cover at least 3 days")
+        self.size = size
+        self.values = deque()
+        self.returns = deque()  # returns[k] is values[k + 1] / values[k] - 1
+        self.mins = deque()  # non-decreasing; mins[0] is the window minimum
+        self.maxs = deque()  # non-increasing; maxs[0] is the window maximum
+        self.value_sum = 0.0
+        self.return_sum = 0.0
+        self.return_sumsq = 0.0
+        self._updates = 0
+
+    def push(self, value: float):
+        if self.values:
+            ret = value / self.values[-1] - 1
+            self.returns.append(ret)
+            self.return_sum += ret
+            self.return_sumsq += ret * ret
+        self.values.append(value)
+        self.value_sum += value
+        while self.mins and self.mins[-1] > value:
+            self.mins.pop()
+        self.mins.append(value)
+        while self.maxs and self.maxs[-1] < value:
+            self.maxs.pop()
+        self.maxs.append(value)
+
+        if len(self.values) > self.size - 1:
+            oldest = self.values.popleft()
+            self.value_sum -= oldest
+            if self.mins[0] == oldest:
+                self.mins.popleft()
+            if self.maxs[0] == oldest:
+                self.maxs.popleft()
+            ret = self.returns.popleft()
+            self.return_sum -= ret
+            self.return_sumsq -= ret * ret
+
+        # Re-add the running sums now and then so rounding error from the
+        # subtractions cannot build up; amortized O(1).
+        self._updates += 1
+        if self._updates >= self.size:
+            self._updates = 0
+            self.value_sum = math.fsum(self.values)
+            self.return_sum = math.fsum(self.returns)
+            self.return_sumsq = math.fsum(r * r for r in self.returns)
+
+    def stats(self, current: float) -> Dict[str, Optional[float]]:
+        """Statistics of the committed days followed by today's ``current`` rate."""
+        days = len(self.values) + 1
+        count, total, total_sq = len(self.returns), self.return_sum, self.return_sumsq
+        if self.values:
+            ret = current / self.values[-1] - 1
+            count, total, total_sq = count + 1, total + ret, total_sq + ret * ret
+        volatility = None
+        if count >= 2:
+            variance = max((total_sq - total * total / count) / (count - 1), 0.0)
+            volatility = math.sqrt(variance) * 100
+        first = self.values[0] if self.values else current
+        return {
+            "days": days,
+            "mean": (self.value_sum + current) / days,
+            "volatility_pct": volatility,
+            "min": min(self.mins[0], current) if self.mins else current,
+            "max": max(self.maxs[0], current) if self.maxs else current,
+            "change_pct": (current / first - 1) * 100,
+        }
+
+
+class TrendTracker:
+    """Incrementally maintained statistics of one pair over several windows.
+
+    Feed it one rate per day with ``update(day, rate)``. Further updates
+    for the same day replace that day's rate (rates are refreshed many
+    times a day), so the latest rate is kept apart from the committed days
+    and only moves into the windows once a later day arrives.
+    """
+
+    def __init__(self, windows: Iterable[int] = DEFAULT_WINDOWS):
+        self.windows = {size: _Window(size) for size in windows}
+        self.day = None
+        self.current = None
+
+    def update(self, day, rate: float):
+        """Add ``rate`` as the rate of ``day``; days before the latest are ignored."""
+        day = np.datetime64(day, "D")
+        if self.day is not None and day < self.day:
+            return
+        if self.day is not None and day > self.day:
+            for window in self.windows.values():
+                window.push(self.current)
+        self.day = day
+        self.current = float(rate)
+
+    def stats(self) -> Dict[int, Dict[str, Optional[float]]]:
+        """Statistics per window size, empty until the first update."""
+        if self.current is None:
+            return {}
+        return {size: window.stats(self.current) for size, window in self.windows.items()}
+
+
+def format_trends(trends: Dict[int, Dict[str, Optional[float]]],
+                  from_currency: str, to_currency: str) -> str:
+    """Render ``TrendTracker.stats()`` as a small text table."""
+    if not trends:
+        return f"No rate history for {from_currency}/{to_currency} yet."
+    lines = [f"{from_currency}/{to_currency}   {'mean':>12} {'min':>12} {'max':>12} "
+             f"{'change':>8} {'volatility':>10}"]
+    for size, stats in sorted(trends.items()):
+        volatility = ("n/a" if stats["volatility_pct"] is None
+                      else f"{stats['volatility_pct']:.3f}%")
+        label = f"{size}d" if stats["days"] >= size else f"{size}d ({stats['days']})"
+        lines.append(f"{label:<10} {stats['mean']:>12.4f} {stats['min']:>12.4f} "
+                     f"{stats['max']:>12.4f} {stats['change_pct']:>+7.2f}% {volatility:>10}")
+    return "\n".join(lines)
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Tests for the "Task Scheduler with Priority and Dependencies" script.
+"""
+
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "Task Scheduler with Priority and Dependencies")
+
+
+def load_scheduler_module():
+    """Import the extensionless script as ``task_scheduler``.
+
+    It is registered in sys.modules so that process pools can pickle
+    references to its functions; workers only see it when they are forked.
+    """
+    if "task_scheduler" in sys.modules:
+        return sys.modules["task_scheduler"]
+    loader = SourceFileLoader("task_scheduler", SCRIPT)
+    module = module_from_spec(spec_from_loader("task_scheduler", loader))
+    sys.modules["task_scheduler"] = module
+    loader.exec_module(module)
+    return module
+
+
+ts = load_scheduler_module()
+
+
+def quiet_scheduler(edges=(), priorities=None, nodes=(), cls=None):
+    scheduler = (cls or ts.TaskScheduler)()
+    scheduler.load_graph(edges, priorities, nodes)
+    return scheduler
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+def meet(barrier, value):
+    barrier.wait()
+    return value
+
+
+class TestIndexedHeap(unittest.TestCase):
+    """IndexedHeap against a dict reference model."""
+
+    def assertHeapValid(self, heap):
+        entries = heap._heap
+        for index in range(1, len(entries)):
+            self.assertLessEqual(entries[(index - 1) // 2], entries[index])
+        # Every entry is live and indexed at its real position.
+        self.assertEqual(heap._pos, {key: i for i, (_, key) in enumerate(entries)})
+
+    def test_random_operations_match_reference(self):
+        """Test push/pop/update/remove/peek against a model over many random operations."""
+        rng = random.Random(21)
+        heap, model = ts.IndexedHeap(), {}
+        for step in range(20_000):
+            op = rng.random()
+            if op < 0.35 or not model:
+                key = rng.randrange(500)
+                priority = rng.randrange(100)
+                if key in model:
+                    with self.assertRaises(KeyError):
+                        heap.push(key, priority)
+                else:
+                    heap.push(key, priority)
+                    model[key] = priority
+            elif op < 0.55:
+                expected = min((p, k) for k, p in model.items())
+                self.assertEqual(heap.peek(), expected[::-1])
+                self.assertEqual(heap.pop(), expected[::-1])
+                del model[expected[1]]
+            elif op < 0.8:
+                key = rng.choice(list(model))
+                model[key] = rng.randrange(100)
+                heap.update(key, model[key])
+            else:
+                key = rng.choice(list(model))
+                self.assertEqual(heap.remove(key), model.pop(key))
+            self.assertEqual(len(heap), len(model))
+            if step % 50 == 0:
+                self.assertHeapValid(heap)
+        self.assertHeapValid(heap)
+        drained = [heap.pop() for _ in range(len(heap))]
+        self.assertEqual(drained, sorted(model.items(), key=lambda kv: (kv[1], kv[0])))
+        self.assertFalse(heap)
+
+    def test_update_and_remove_keep_order(self):
+        """Test sifting in both directions after update() and remove()."""
+        heap = ts.IndexedHeap()
+        heap.push_many((key, key) for key in range(1, 64))
+        self.assertHeapValid(heap)
+        heap.update(63, 0)  # a leaf becomes the root
+        self.assertEqual(heap.peek(), (63, 0))
+        heap.update(63, 100)  # and sinks back to a leaf
+        heap.update(1, 50)
+        heap.remove(2)
+        heap.remove(40)
+        self.assertHeapValid(heap)
+        priorities = {key: key for key in range(3, 63) if key != 40}
+        priorities.update({1: 50, 63: 100})
+        self.assertEqual([heap.pop() for _ in range(len(heap))],
+                         sorted(priorities.items(), key=lambda kv: (kv[1], kv[0])))
+
+    def test_push_many_into_non_empty_heap(self):
+        """Test that push_many() falls back to single pushes and rejects duplicates."""
+        heap = ts.IndexedHeap()
+        heap.push("b", 2)
+        heap.push_many([("a", 1), ("c", 3)])
+        self.assertHeapValid(heap)
+        with self.assertRaises(KeyError):
+            heap.push_many([("a", 5)])
+        with self.assertRaises(IndexError):
+            ts.IndexedHeap().pop()
+
+
+class TestQueueOperations(unittest.TestCase):
+    """update_priority, remove_task and peek_task on TaskScheduler."""
+
+    def setUp(self):
+        self.scheduler = quiet_scheduler([("base", "child")],
+                                         {"base": 1, "a": 5, "b": 3, "child": 10}, ["a", "b"])
+
+    def test_peek_does_not_take(self):
+        """Test that peek_task() returns what next_task() would take."""
+        self.assertEqual(self.scheduler.peek_task(), "a")
+        self.assertEqual(self.scheduler.peek_task(), "a")
+        self.assertEqual(self.scheduler.next_task(), "a")
+        self.assertEqual(self.scheduler.peek_task(), "b")
+        self.assertIsNone(ts.TaskScheduler().peek_task())
+
+    def test_update_priority_reorders_queue(self):
+        """Test that new priorities apply to queued and not-yet-ready tasks."""
+        self.scheduler.update_priority("base", 9)
+        self.assertEqual(self.scheduler.peek_task(), "base")
+        # A task that is not ready yet keeps its new priority for later.
+        self.scheduler.update_priority("child", 0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.scheduler.complete_task(self.scheduler.next_task())
+        self.assertEqual([self.scheduler.next_task() for _ in range(3)], ["a", "b", "child"])
+        self.assertEqual(len(self.scheduler.available_tasks), 0)
+        with self.assertRaises(ValueError):
+            self.scheduler.update_priority("missing", 1)
+
+    def test_remove_task(self):
+        """Test that remove_task() refuses tasks with pending dependents."""
+        with self.assertRaises(ValueError):
+            self.scheduler.remove_task("base")  # child still depends on it
+        self.scheduler.remove_task("a")
+        self.assertNotIn("a", self.scheduler.tasks)
+        self.assertNotIn("a", self.scheduler.available_tasks)
+        self.scheduler.remove_task("child")
+        self.scheduler.remove_task("base")
+        self.assertEqual(self.scheduler.next_task(), "b")
+        self.assertIsNone(self.scheduler.next_task())
+
+
+class TestTaskGraph(unittest.TestCase):
+    """TaskGraph construction, cycle reports and planning."""
+
+    EDGES = [("design", "build"), ("build", "test"), ("design", "docs"),
+             ("test", "release"), ("docs", "release")]
+    DURATIONS = {"build": 3, "test": 2}
+
+    def test_csr_layout(self):
+        """Test ids in first-seen order and dependents in CSR form."""
+        graph = ts.TaskGraph.from_edges(self.EDGES, nodes=["lonely", "design"])
+        self.assertEqual(graph.ids, ["design", "build", "test", "docs", "release", "lonely"])
+        self.assertEqual(graph.edge_count, 5)
+        self.assertEqual(sorted(graph.ids[v] for v in graph.dependents(0)), ["build", "docs"])
+        self.assertEqual(list(graph.indegree), [0, 1, 1, 1, 2, 0])
+
+    def test_level_groups(self):
+        """Test grouping by topological level."""
+        graph = ts.TaskGraph.from_edges(self.EDGES)
+        self.assertEqual(graph.level_groups(),
+                         [["design"], ["build", "docs"], ["test"], ["release"]])
+        self.assertEqual(ts.TaskGraph.from_edges([]).level_groups(), [])
+
+    def test_critical_path(self):
+        """Test the longest weighted chain on a known DAG."""
+        graph = ts.TaskGraph.from_edges(self.EDGES)
+        self.assertEqual(graph.critical_path(self.DURATIONS),
+                         (7.0, ["design", "build", "test", "release"]))
+        # With unit durations, the longest chain is the number of levels.
+        self.assertEqual(graph.critical_path()[0], 4.0)
+        self.assertEqual(ts.TaskGraph.from_edges([]).critical_path(), (0.0, []))
+
+    def test_plan(self):
+        """Test plan() figures on a known DAG."""
+        graph = ts.TaskGraph.from_edges(self.EDGES)
+        plan = graph.plan(2, self.DURATIONS)
+        self.assertEqual(plan["total_work"], 8.0)
+        self.assertEqual(plan["critical_path"], 7.0)
+        self.assertEqual(plan["lower_bound"], 7.0)
+        self.assertEqual(plan["makespan"], 7.0)
+        self.assertEqual(graph.plan(1, self.DURATIONS)["makespan"], 8.0)
+        with self.assertRaises(ValueError):
+            graph.plan(0)
+
+    def test_plan_bounds_on_random_dags(self):
+        """Test lower_bound <= makespan <= 2 * lower_bound for list scheduling."""
+        rng = random.Random(24)
+        for _ in range(100):
+            n = rng.randint(1, 40)
+            edges = [(a, b) for a in range(n) for b in range(a + 1, n) if rng.random() < 0.1]
+            durations = {i: rng.randint(1, 9) for i in range(n)}
+            graph = ts.TaskGraph.from_edges(edges, nodes=range(n))
+            for workers in (1, 2, 5):
+                plan = graph.plan(workers, durations)
+                self.assertLessEqual(plan["lower_bound"], plan["makespan"])
+                self.assertLessEqual(plan["makespan"], 2 * plan["lower_bound"])
+
+    def test_self_loop(self):
+        """Test that a task depending on itself is reported as a cycle."""
+        with self.assertRaises(ts.CycleError) as caught:
+            ts.TaskGraph.from_edges([("a", "b"), ("b", "b")])
+        self.assertEqual(caught.exception.cycle, ["b", "b"])
+        self.assertEqual(caught.exception.blocked, 1)
+        self.assertIn("b -> b", str(caught.exception))
+
+    def test_cycle_with_downstream_tasks(self):
+        """Test that tasks behind a cycle are counted but not reported as the cycle."""
+        edges = [("start", "x"), ("x", "y"), ("y", "z"), ("z", "x"), ("z", "after"),
+                 ("after", "end")]
+        with self.assertRaises(ts.CycleError) as caught:
+            ts.TaskGraph.from_edges(edges)
+        error = caught.exception
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(error.cycle[0], error.cycle[-1])
+        self.assertEqual(set(error.cycle), {"x", "y", "z"})
+        for dependency, task_id in zip(error.cycle, error.cycle[1:]):
+            self.assertIn((dependency, task_id), edges)
+        self.assertEqual(error.blocked, 5)
+
+    def test_read_edge_list(self):
+        """Test that comments and blank lines are skipped."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "edges.txt")
+            with open(path, "w") as f:
+                f.write("# dependency task\nA B\n\nB\tC\n")
+            self.assertEqual(list(ts.read_edge_list(path)), [("A", "B"), ("B", "C")])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestLoadGraph(unittest.TestCase):
+    """TaskScheduler.load_graph()."""
+
+    def test_load_graph(self):
+        """Test that loaded tasks behave like ones added one by one."""
+        scheduler = quiet_scheduler([("a", "c"), ("b", "c")], {"a": 1, "b": 2, "c": 3}, ["d"])
+        self.assertEqual(scheduler.tasks["c"].dependencies, {"a", "b"})
+        self.assertEqual(scheduler.tasks["a"].dependents, {"c"})
+        self.assertEqual(scheduler.next_task(), "b")
+        self.assertEqual(sorted([scheduler.next_task(), scheduler.next_task()]), ["a", "d"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.complete_task("a")
+            scheduler.complete_task("b")
+        self.assertEqual(scheduler.next_task(), "c")
+
+    def test_rejects_existing_ids_without_changes(self):
+        """Test that a graph reusing an existing id is refused as a whole."""
+        scheduler = quiet_scheduler([("a", "b")])
+        with self.assertRaises(ValueError):
+            scheduler.load_graph([("x", "a")])
+        self.assertEqual(set(scheduler.tasks), {"a", "b"})
+        self.assertEqual(scheduler.tasks["a"].dependencies, set())
+        self.assertEqual(len(scheduler.available_tasks), 1)
+
+    def test_cycle_leaves_scheduler_unchanged(self):
+        """Test that a cyclic graph adds nothing."""
+        scheduler = quiet_scheduler(nodes=["a"])
+        with self.assertRaises(ts.CycleError):
+            scheduler.load_graph([("p", "q"), ("q", "p")])
+        self.assertEqual(list(scheduler.tasks), ["a"])
+        self.assertEqual(len(scheduler.available_tasks), 1)
+
+
+class TestCompactTaskScheduler(unittest.TestCase):
+    """CompactTaskScheduler against TaskScheduler."""
+
+    def test_same_order_as_task_scheduler(self):
+        """Test that both schedulers hand out tasks in the same order."""
+        rng = random.Random(25)
+        for _ in range(200):
+            n = rng.randint(1, 40)
+            edges = [(a, b) for a in range(n) for b in range(a + 1, n) if rng.random() < 0.1]
+            rng.shuffle(edges)
+            # Distinct priorities, so ties cannot be broken differently.
+            priorities = dict(zip(range(n), rng.sample(range(1000), n)))
+            objects = quiet_scheduler(edges, priorities, range(n))
+            compact = ts.CompactTaskScheduler.from_edges(edges, priorities, range(n))
+            for _ in range(3):
+                task_id, priority = rng.randrange(n), rng.randrange(1000, 2000)
+                objects.update_priority(task_id, priority)
+                compact.update_priority(task_id, priority)
+
+            orders = []
+            for scheduler in (objects, compact):
+                order = []
+                with contextlib.redirect_stdout(io.StringIO()):
+                    while (task_id := scheduler.peek_task()) is not None:
+                        self.assertEqual(scheduler.next_task(), task_id)
+                        order.append(task_id)
+                        scheduler.complete_task(task_id)
+                orders.append(order)
+            self.assertEqual(orders[0], orders[1])
+            self.assertEqual(sorted(orders[1]), list(range(n)))
+            self.assertTrue(all(compact.is_completed(i) for i in range(n)))
+
+    def test_complete_out_of_order(self):
+        """Test completing a task before its dependencies, and twice."""
+        compact = ts.CompactTaskScheduler.from_edges([("a", "b"), ("b", "c")])
+        compact.complete_task("b")
+        compact.complete_task("b")
+        self.assertEqual(list(compact.remaining), [0, 1, 0])
+        self.assertEqual([compact.next_task(), compact.next_task()], ["a", "c"])
+        with self.assertRaises(ValueError):
+            compact.complete_task("missing")
+
+    def test_memory_benchmark(self):
+        """Smoke test: both representations are measured and compact is smaller."""
+        results = ts.memory_benchmark(tasks=2_000, fanout=3)
+        self.assertEqual(results["tasks"], 2_000)
+        self.assertEqual(results["edges"], 1_999 * 3 - 3)
+        for name in ("objects", "compact"):
+            self.assertGreater(results[name]["bytes"], 0)
+        self.assertGreater(results["ratio"], 1.5)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            ts.print_memory_benchmark(results)
+        self.assertIn("smaller", out.getvalue())
+
+
+class TestRun(unittest.TestCase):
+    """TaskScheduler.run() on thread and process pools."""
+
+    def test_diamond_runs_branches_concurrently(self):
+        """Test that independent branches overlap and the join waits for both."""
+        scheduler = quiet_scheduler([("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")])
+        # B and C can only pass the barrier if they run at the same time.
+        barrier = threading.Barrier(2, timeout=5)
+        callables = {"A": lambda: "a", "B": partial(meet, barrier, 1),
+                     "C": partial(meet, barrier, 2), "D": lambda: "d"}
+        report = scheduler.run(callables, max_workers=2)
+
+        self.assertTrue(report.ok, report.errors)
+        self.assertEqual(report.results, {"A": "a", "B": 1, "C": 2, "D": "d"})
+        self.assertEqual(report.peak_parallel, 2)
+        timings = report.timings
+        self.assertGreaterEqual(timings["B"].submitted, timings["A"].finished)
+        self.assertGreaterEqual(timings["D"].submitted,
+                                max(timings["B"].finished, timings["C"].finished))
+        self.assertTrue(all(task.completed for task in scheduler.tasks.values()))
+
+    def test_priority_order_under_max_parallel(self):
+        """Test that ready tasks start by priority, including newly released ones."""
+        scheduler = quiet_scheduler([("A", "X")], {"A": 10, "X": 100, "L1": 5, "L2": 4},
+                                    ["L1", "L2"])
+        started = []
+        callables = {task_id: partial(started.append, task_id) for task_id in scheduler.tasks}
+        report = scheduler.run(callables, max_workers=4, max_parallel=1)
+
+        self.assertTrue(report.ok)
+        self.assertEqual(started, ["A", "X", "L1", "L2"])
+        self.assertEqual(report.peak_parallel, 1)
+
+    def test_failure_skips_dependents_transitively(self):
+        """Test that everything downstream of a failed task is skipped, nothing else."""
+        scheduler = quiet_scheduler([("A", "B"), ("B", "C"), ("A", "E")], nodes=["D"])
+        report = scheduler.run({"A": fail, "B": lambda: 1, "C": lambda: 2,
+                                "D": lambda: 3, "E": lambda: 4}, max_workers=2)
+
+        self.assertFalse(report.ok)
+        self.assertIsInstance(report.errors["A"], RuntimeError)
+        self.assertEqual(sorted(report.skipped), ["B", "C", "E"])
+        self.assertEqual(report.results, {"D": 3})
+        self.assertEqual(report.not_run, [])
+        self.assertFalse(scheduler.tasks["A"].completed)
+
+    def test_fail_fast_starts_nothing_new(self):
+        """Test that fail_fast stops submitting after the first failure."""
+        scheduler = quiet_scheduler(priorities={"bad": 10, "x": 5, "y": 4},
+                                    nodes=["bad", "x", "y"])
+        report = scheduler.run({"bad": fail, "x": lambda: 1, "y": lambda: 2},
+                               max_workers=2, max_parallel=1, fail_fast=True)
+
+        self.assertEqual(list(report.errors), ["bad"])
+        self.assertEqual(report.results, {})
+        self.assertEqual(sorted(report.not_run), ["x", "y"])
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_process_pool(self):
+        """Test a run on a process pool with picklable callables."""
+        scheduler = quiet_scheduler([("a", "c"), ("b", "c")])
+        # Spawned workers could not import the extensionless script.
+        with ProcessPoolExecutor(max_workers=2,
+                                 mp_context=multiprocessing.get_context("fork")) as pool:
+            report = scheduler.run({"a": partial(pow, 2, 10), "b": partial(pow, 3, 3),
+                                    "c": partial(divmod, 7, 2)}, executor=pool, max_parallel=2)
+
+        self.assertTrue(report.ok, report.errors)
+        self.assertEqual(report.results, {"a": 1024, "b": 27, "c": (3, 1)})
+        self.assertTrue(all(timing.run_time >= 0 for timing in report.timings.values()))
+
+    def test_missing_callable(self):
+        """Test that every pending task needs a callable."""
+        scheduler = quiet_scheduler([("a", "b")])
+        with self.assertRaises(ValueError):
+            scheduler.run({"a": lambda: 1})
+
+    def test_caller_executor_requires_max_parallel(self):
+        """Test that a caller's Executor needs max_parallel and is left running."""
+        scheduler = quiet_scheduler(nodes=["a", "b"])
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with self.assertRaises(ValueError):
+                scheduler.run({"a": lambda: 1, "b": lambda: 2}, executor=pool)
+            report = scheduler.run({"a": lambda: 1, "b": lambda: 2}, executor=pool,
+                                   max_parallel=2)
+            self.assertEqual(report.results, {"a": 1, "b": 2})
+            self.assertEqual(pool.submit(int, "7").result(), 7)
+
+    def test_tasks_added_one_by_one(self):
+        """Test run() on tasks added with add_task()."""
+        scheduler = ts.TaskScheduler()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.add_task("T1", 1)
+            scheduler.add_task("T2", 2, ["T1"])
+        report = scheduler.run({"T1": lambda: 1, "T2": lambda: 2}, max_workers=1)
+        self.assertEqual(report.results, {"T1": 1, "T2": 2})
+
+
+
+class TestAsyncRun(unittest.TestCase):
+    """AsyncTaskScheduler.run() on one event loop."""
+
+    def test_max_concurrency_cap(self):
+        """Test that no more than max_concurrency coroutines run at once."""
+        scheduler = quiet_scheduler(nodes=range(10), cls=ts.AsyncTaskScheduler)
+        state = {"running": 0, "peak": 0}
+
+        async def work():
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.01)
+            state["running"] -= 1
+
+        report = asyncio.run(scheduler.run({i: work for i in range(10)}, max_concurrency=3))
+        self.assertTrue(report.ok)
+        self.assertEqual(len(report.results), 10)
+        self.assertEqual(state["peak"], 3)
+        self.assertEqual(report.peak_parallel, 3)
+
+    def test_dependents_released_on_completion(self):
+        """Test that a task starts only after its dependencies finished."""
+        scheduler = quiet_scheduler([("a", "c"), ("b", "c")], cls=ts.AsyncTaskScheduler)
+        log = []
+
+        async def step(name, delay):
+            log.append(("start", name))
+            await asyncio.sleep(delay)
+            log.append(("end", name))
+            return name
+
+        report = asyncio.run(scheduler.run({"a": partial(step, "a", 0.02),
+                                            "b": partial(step, "b", 0.01),
+                                            "c": partial(step, "c", 0)}))
+        self.assertEqual(report.results, {"a": "a", "b": "b", "c": "c"})
+        self.assertEqual(log[:2], [("start", "a"), ("start", "b")])
+        self.assertGreater(log.index(("start", "c")), log.index(("end", "a")))
+        self.assertGreater(log.index(("start", "c")), log.index(("end", "b")))
+
+    def test_failure_and_fail_fast(self):
+        """Test that failures skip dependents, and fail_fast starts nothing new."""
+        async def bad():
+            raise RuntimeError("boom")
+
+        async def good():
+            return 1
+
+        scheduler = quiet_scheduler([("bad", "child")], nodes=["other"],
+                                    cls=ts.AsyncTaskScheduler)
+        report = asyncio.run(scheduler.run({"bad": bad, "child": good, "other": good}))
+        self.assertEqual(list(report.errors), ["bad"])
+        self.assertEqual(report.skipped, ["child"])
+        self.assertEqual(report.results, {"other": 1})
+
+        scheduler = quiet_scheduler(priorities={"bad": 10, "x": 1}, nodes=["bad", "x"],
+                                    cls=ts.AsyncTaskScheduler)
+        report = asyncio.run(scheduler.run({"bad": bad, "x": good}, max_concurrency=1,
+                                           fail_fast=True))
+        self.assertEqual(list(report.errors), ["bad"])
+        self.assertEqual(report.not_run, ["x"])
+
+    def test_cancelling_run_cancels_tasks(self):
+        """Test that cancelling run() cancels the coroutines in flight."""
+        scheduler = quiet_scheduler(nodes=["a", "b"], cls=ts.AsyncTaskScheduler)
+        started, cancelled = [], []
+
+        async def forever(name):
+            started.append(name)
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+
+        async def main():
+            runner = asyncio.ensure_future(scheduler.run({"a": partial(forever, "a"),
+                                                          "b": partial(forever, "b")}))
+            while len(started) < 2:
+                await asyncio.sleep(0)
+            runner.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await runner
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        self.assertEqual(sorted(cancelled), ["a", "b"])
+
+    def test_error_in_first_dispatch_cancels_started_tasks(self):
+        """Test that a coroutine function raising while run() starts up orphans nothing."""
+        scheduler = quiet_scheduler(priorities={"a": 10, "b": 1}, nodes=["a", "b"],
+                                    cls=ts.AsyncTaskScheduler)
+
+        def broken():
+            raise TypeError("not a coroutine function")
+
+        async def main():
+            with self.assertRaises(TypeError):
+                await scheduler.run({"a": asyncio.get_running_loop().create_future,
+                                     "b": broken})
+            await asyncio.sleep(0)
+            return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+        self.assertEqual(asyncio.run(main()), [])
+
+if __name__ == "__main__":
+    unittest.main()